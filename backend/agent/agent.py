@@ -58,18 +58,21 @@ When the user's question is best answered with a diagram (flowchart, sequence, o
 After your thought process, provide the final, detailed answer to the user based on your analysis in markdown supported format without any html tags.
 """
 
-# Create the agent using the new create_agent factory
-try:
-    stackexchange_agent = create_agent(
-        model=answer_LLM(),
-        tools=[graph_rag_tool],
-        system_prompt=system_prompt,
-        debug=False,
-        name="StackExchangeAgent",
-        middleware=[summarize],
-    )
 
-    logger.info("LangChain Agent initialized successfully with middleware")
-except Exception as e:
-    logger.error(f"Failed to initialize agent: {e}")
-    raise
+def build_agent():
+    """Creates the agent using the create_agent factory (lazy component "agent")."""
+    try:
+        stackexchange_agent = create_agent(
+            model=answer_LLM(),
+            tools=[graph_rag_tool],
+            system_prompt=system_prompt,
+            debug=False,
+            name="StackExchangeAgent",
+            middleware=[summarize],
+        )
+
+        logger.info("LangChain Agent initialized successfully with middleware")
+        return stackexchange_agent
+    except Exception as e:
+        logger.error(f"Failed to initialize agent: {e}")
+        raise
@@ -0,0 +1,118 @@
+"""Streaming adapter: answer tokens from the agent's model node plus named stage signals"""
+
+import asyncio
+import functools
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from langchain_core.messages import AIMessageChunk
+from langgraph.config import get_stream_writer
+
+logger = logging.getLogger(__name__)
+
+# Node of the create_agent graph that produces the answer. Tokens from other nodes (e.g.
+# the summarization middleware's model) are not forwarded to the client.
+ANSWER_NODE = "model"
+
+# Client-facing text of each stage signal, by (stage, status)
+STAGE_MESSAGES: Dict[tuple, str] = {
+    ("tool_start", "running"): "🛠️ Using tool: {tool}...",
+    ("tool_end", "complete"): "✅ Tool {tool} completed",
+    ("graph_traversal", "running"): "🕷️ Traversing Knowledge Graph...",
+    ("graph_traversal", "complete"): "✅ Found {count} documents",
+    ("reranking", "running"): "⚖️ Reranking Documents...",
+    ("reranking", "complete"): "✅ Top {count} documents selected",
+    ("speculative_retrieval", "complete"): "⚡ Reused {count} prefetched documents",
+}
+
+# Set when the client of the current agent stream has gone away. Copied into the worker
+# threads that run retrieval steps, so steps not yet started are skipped.
+_cancel_event: ContextVar[Optional[threading.Event]] = ContextVar(
+    "stream_cancel_event", default=None
+)
+
+
+@contextmanager
+def cancellation_scope(event: Optional[threading.Event] = None):
+    """Scopes a cancel event to one agent stream; set it to stop the remaining steps."""
+    event = event or threading.Event()
+    token = _cancel_event.set(event)
+    try:
+        yield event
+    finally:
+        _cancel_event.reset(token)
+
+
+def cancel_requested() -> bool:
+    event = _cancel_event.get()
+    return event is not None and event.is_set()
+
+
+# ===========================================================================================================================================================
+# Stage signals
+# ===========================================================================================================================================================
+def emit_stage(stage: str, status: str, **data: Any) -> None:
+    """Sends a stage signal to the agent stream; a no-op outside an agent run (e.g. warmup)."""
+    try:
+        writer = get_stream_writer()
+    except Exception:
+        return
+    writer({"stage": stage, "status": status, **data})
+
+
+def stage_signal(stage: str) -> Callable:
+    """
+    Wraps a retrieval step in running / complete signals, the latter with the result
+    count. The step is not started once the stream has been cancelled.
+    """
+
+    def decorator(step: Callable) -> Callable:
+        @functools.wraps(step)
+        def wrapper(*args, **kwargs):
+            if cancel_requested():
+                raise asyncio.CancelledError(f"{stage} skipped: stream cancelled")
+            emit_stage(stage, "running")
+            result = step(*args, **kwargs)
+            emit_stage(stage, "complete", count=len(result))
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+# ===========================================================================================================================================================
+# Adapter
+# ===========================================================================================================================================================
+def status_event(signal: Dict) -> Dict:
+    """Client status event for a stage signal."""
+    template = STAGE_MESSAGES.get((signal.get("stage"), signal.get("status")), "")
+    return {"type": "status", **signal, "message": template.format(**signal)}
+
+
+async def stream_agent(agent, input_data: Dict) -> AsyncIterator[Dict]:
+    """
+    Streams one agent run as client events: `status` for stage signals and `token` for
+    answer chunks. Only the "messages" and "custom" stream modes are subscribed, so
+    LangGraph does not trace and serialize every chain, prompt and parser run.
+    """
+    async for mode, payload in agent.astream(
+        input_data, stream_mode=["messages", "custom"]
+    ):
+        if mode == "custom":
+            yield status_event(payload)
+            continue
+
+        chunk, metadata = payload
+        if not isinstance(chunk, AIMessageChunk):
+            continue
+        if metadata.get("langgraph_node") != ANSWER_NODE:
+            continue
+
+        content = chunk.content if isinstance(chunk.content, str) else ""
+        reasoning = chunk.additional_kwargs.get("reasoning_content", "")
+        if content or reasoning:
+            yield {"type": "token", "content": content, "reasoning_content": reasoning}
@@ -4,28 +4,43 @@ import logging
 import uuid
 import uvicorn
 
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import AsyncGenerator, Dict, List
+from typing import AsyncGenerator, Dict, List, Optional
 from urllib.parse import urlparse
 
+# Imported first: the registry's creation time marks the start of the app's imports
+from setup.components import COMPONENT_WARMUP, components
+
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from starlette.middleware import Middleware
 from langchain_core.messages import HumanMessage
 
 from setup.init_config import (
-    answer_LLM,
-    embedding_model,
+    ANSWER_LLM_MODEL,
+    model_client_stats,
     get_graph_instance,
     NEO4J_URL,
     NEO4J_USERNAME,
 )
 
-from agent.agent import stackexchange_agent
+from agent.streaming import cancellation_scope, stream_agent
+from tools.speculative_retrieval import (
+    speculative_retrieval,
+    speculative_retrieval_stats,
+)
+from setup.readiness import readiness
 from utils.util import find_container_by_port
+from ingest.pipeline import process_ingestion
+from ingest.jobs import ingest_jobs
+from ingest.backfill import EMBEDDING_BACKFILL, embedding_backfill
+from utils.metrics import metrics
+from utils.query_embedding import query_embedding_scope
+from utils.stream_registry import Generation, generations, parse_last_event_id
 from utils.memory import (
     add_ai_message_to_session,
     add_user_message_to_session,
@@ -34,9 +49,15 @@ from utils.memory import (
     get_all_users,
     get_chat_history,
     get_user_sessions,
-    link_session_to_user,
+    init_session_metadata,
+    session_page_cursor,
+    SESSION_PAGE_SIZE,
+    SESSION_PAGE_SIZE_MAX,
 )
 
+# Models, reranker and agent are built lazily; only module imports are paid here
+components.record("app_imports", components.since_created())
+
 # Load environment variables
 load_dotenv()
 
@@ -55,8 +76,30 @@ middleware = [
     )
 ]
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Starts ingestion workers, component warmup and the embedding backfill for the lifetime of the app."""
+    await ingest_jobs.start()
+    # Index and one-off backfill for the session listing, off the startup path
+    session_metadata_task = asyncio.create_task(
+        asyncio.to_thread(init_session_metadata)
+    )
+    # Builds components, primes models and indexes, then keeps probing dependencies
+    readiness.start(warmup=COMPONENT_WARMUP)
+    if EMBEDDING_BACKFILL:
+        embedding_backfill.start()
+    yield
+    readiness.stop()
+    await session_metadata_task
+    embedding_backfill.stop()
+    await ingest_jobs.stop()
+
+
 # initialise fastapi
-app = FastAPI(title="GraphRAG API", version="1.2.0", middleware=middleware)
+app = FastAPI(
+    title="GraphRAG API", version="1.2.0", middleware=middleware, lifespan=lifespan
+)
 
 
 class QueryRequest(BaseModel):
@@ -71,10 +114,20 @@ class IngestRequest(BaseModel):
     data: List[Dict]
 
 
+class IngestJobRequest(BaseModel):
+    data: List[Dict] = []
+    expected_pages: int = 1  # pages the job waits for before it completes
+
+
+class IngestPageFailure(BaseModel):
+    error: str = "Page could not be submitted"
+
+
 class ImportRecordRequest(BaseModel):
     total_questions: int
     tags_list: List[str]
     total_pages: int
+    job_id: Optional[str] = None  # ingestion job whose counters the log tracks
 
 
 @app.get("/")
@@ -88,6 +141,30 @@ def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
 
+@app.get("/ready")
+def readiness_check():
+    """Readiness for load balancers: 503 until warmup finished and dependencies respond."""
+    snapshot = readiness.snapshot()
+    return JSONResponse(status_code=200 if snapshot["ready"] else 503, content=snapshot)
+
+
+@app.get("/api/v1/metrics")
+def get_metrics():
+    """Process-wide counters and per-stage throughput (e.g. ingest embed / write)."""
+    return {
+        "status": "success",
+        **metrics.snapshot(),
+        "model_clients": model_client_stats(),
+        "speculative_retrieval": speculative_retrieval_stats(),
+    }
+
+
+@app.get("/api/v1/startup")
+def get_startup_report():
+    """Import and init time per component, and which components are loaded yet."""
+    return {"status": "success", "components": components.report()}
+
+
 # --- Add config endpoint ---
 @app.get("/api/v1/config")
 def get_configuration():
@@ -108,7 +185,7 @@ def get_configuration():
             container_name = discovered_name
 
         return {
-            "ollama_model": answer_LLM().model,
+            "ollama_model": ANSWER_LLM_MODEL,
             "neo4j_url": NEO4J_URL,
             "container_name": container_name,
             "neo4j_user": NEO4J_USERNAME,
@@ -137,11 +214,19 @@ def get_users():
 
 
 @app.get("/api/v1/user/{user_id}/chats")
-def get_user_chats(user_id: str):
-    """Returns a list of chat sessions for a specific user."""
+def get_user_chats(
+    user_id: str,
+    limit: int = Query(SESSION_PAGE_SIZE, ge=1, le=SESSION_PAGE_SIZE_MAX),
+    before: Optional[str] = None,
+):
+    """Returns a page of a user's chat sessions, newest first; pass `next_cursor` as `before`."""
     try:
-        sessions = get_user_sessions(user_id)
-        return {"chats": sessions, "status": "success"}
+        sessions = get_user_sessions(user_id, limit=limit, before=before)
+        return {
+            "chats": sessions,
+            "next_cursor": session_page_cursor(sessions, limit),
+            "status": "success",
+        }
     except Exception as e:
         logger.error(f"Error fetching chats for user {user_id}: {e}")
         return {"chats": [], "status": "error", "message": str(e)}
@@ -153,7 +238,8 @@ def get_chat_messages(session_id: str):
     try:
         query = """
         MATCH (s:Session {id: $session_id})-[:HAS_MESSAGE]->(m:Message)
-        RETURN m.type AS role, m.content AS content, m.thought AS thought
+        RETURN m.type AS role, m.content AS content, m.thought AS thought,
+               coalesce(m.truncated, false) AS truncated
         ORDER BY coalesce(m.created_at, m.timestamp, elementId(m)) ASC
         LIMIT 1000
         """
@@ -205,58 +291,126 @@ def delete_app_user(user_id: str):
 
 @app.post("/api/v1/ingest")
 async def ingest_stackoverflow_data(request: IngestRequest):
-    """Ingest StackOverflow data: compute embeddings and insert into Neo4j."""
+    """Ingest StackOverflow data: embed and insert only new or changed items into Neo4j."""
     try:
-        from tools.graph_rag_tool import import_query
-
         data_items = request.data
         if not data_items:
             return {"status": "skipped", "message": "No data items to ingest."}
 
         # Use a separate thread for the heavy lifting (embeddings + DB)
-        def process_ingestion(items):
-            # 1. Prepare texts for batch embedding
-            texts_to_embed = []
-            map_to_object = []  # List of tuples/dicts to map back: (type, parent_idx, answer_idx)
-
-            for q_idx, q in enumerate(items):
-                # Question text
-                q_text = q.get("title", "") + "\n" + q.get("body_markdown", "")
-                texts_to_embed.append(q_text)
-                map_to_object.append(("question", q_idx, -1))
-
-                # Answer texts
-                # Note: Original code used question_text + answer body for answer embedding
-                for a_idx, a in enumerate(q.get("answers", [])):
-                    a_text = q_text + "\n" + a.get("body_markdown", "")
-                    texts_to_embed.append(a_text)
-                    map_to_object.append(("answer", q_idx, a_idx))
-
-            # 2. Compute embeddings in batch
-            if texts_to_embed:
-                embeddings = embedding_model().embed_documents(texts_to_embed)
-
-                # 3. Assign embeddings back
-                for i, embedding in enumerate(embeddings):
-                    obj_type, q_idx, a_idx = map_to_object[i]
-                    if obj_type == "question":
-                        items[q_idx]["embedding"] = embedding
-                    elif obj_type == "answer":
-                        items[q_idx]["answers"][a_idx]["embedding"] = embedding
-
-            # 4. Insert into Neo4j
-            get_graph_instance().query(import_query, {"data": items})
-            return len(items)
-
-        count = await asyncio.to_thread(process_ingestion, data_items)
-
-        return {"status": "success", "count": count}
+        summary = await asyncio.to_thread(process_ingestion, data_items)
+
+        return {"status": "success", **summary}
 
     except Exception as e:
         logger.error(f"Error during ingestion: {e}")
         return {"status": "error", "message": str(e)}
 
 
+@app.post("/api/v1/ingest/jobs")
+async def create_ingest_job(request: IngestJobRequest):
+    """Create an ingestion job and queue its first page; returns immediately."""
+    try:
+        job = ingest_jobs.create_job(request.expected_pages)
+        if request.data:
+            ingest_jobs.submit_page(job.job_id, request.data)
+        return {"status": "success", "job_id": job.job_id}
+    except asyncio.QueueFull:
+        # The job exists; its first page is recorded as failed so the job can finish
+        await ingest_jobs.fail_page(job.job_id, "Ingestion queue was full")
+        return JSONResponse(
+            status_code=429,
+            content={
+                "status": "error",
+                "job_id": job.job_id,
+                "message": "Ingestion queue is full, retry later",
+            },
+        )
+    except Exception as e:
+        logger.error(f"Error creating ingest job: {e}")
+        return {"status": "error", "message": str(e)}
+
+
+@app.post("/api/v1/ingest/jobs/{job_id}/pages")
+async def submit_ingest_page(job_id: str, request: IngestRequest):
+    """Queue another page for an existing ingestion job; returns immediately."""
+    try:
+        job = ingest_jobs.submit_page(job_id, request.data)
+        return {
+            "status": "success",
+            "job_id": job_id,
+            "pages_submitted": job.pages_submitted,
+        }
+    except KeyError:
+        return {"status": "error", "message": f"Unknown ingest job {job_id}"}
+    except asyncio.QueueFull:
+        # Not counted yet: the client retries, or reports the page as failed
+        return JSONResponse(
+            status_code=429,
+            content={
+                "status": "error",
+                "message": "Ingestion queue is full, retry later",
+            },
+        )
+    except Exception as e:
+        logger.error(f"Error submitting page to ingest job {job_id}: {e}")
+        return {"status": "error", "message": str(e)}
+
+
+@app.post("/api/v1/ingest/jobs/{job_id}/failures")
+async def fail_ingest_page(job_id: str, request: IngestPageFailure):
+    """Count a page the client could not submit as failed, so the job can finish."""
+    try:
+        job = await ingest_jobs.fail_page(job_id, request.error)
+        return {
+            "status": "success",
+            "job_id": job_id,
+            "pages_failed": job.pages_failed,
+        }
+    except KeyError:
+        return {"status": "error", "message": f"Unknown ingest job {job_id}"}
+
+
+@app.get("/api/v1/ingest/jobs/{job_id}")
+def get_ingest_job(job_id: str):
+    """Return the progress of an ingestion job."""
+    job = ingest_jobs.jobs.get(job_id)
+    if job is None:
+        return {"status": "error", "message": f"Unknown ingest job {job_id}"}
+    return {"status": "success", "job": job.snapshot()}
+
+
+@app.get("/api/v1/ingest/jobs/{job_id}/events")
+async def stream_ingest_job(job_id: str) -> StreamingResponse:
+    """Stream ingestion job progress (pages, items per second, errors) over SSE."""
+
+    async def job_event_generator() -> AsyncGenerator[str]:
+        if job_id not in ingest_jobs.jobs:
+            yield f"data: {json.dumps({'type': 'error', 'content': f'Unknown ingest job {job_id}'})}\n\n"
+            return
+        async for snapshot in ingest_jobs.stream(job_id):
+            yield f"data: {json.dumps({'type': 'progress', **snapshot})}\n\n"
+
+    return StreamingResponse(
+        job_event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/v1/ingest/backfill")
+def get_backfill_progress():
+    """Progress of the background embedding backfill per node label."""
+    return {"status": "success", "backfill": embedding_backfill.snapshot()}
+
+
+@app.post("/api/v1/ingest/backfill")
+def start_backfill():
+    """(Re)starts the embedding backfill, e.g. after a bulk load without embeddings."""
+    embedding_backfill.start()
+    return {"status": "success", "backfill": embedding_backfill.snapshot()}
+
+
 @app.post("/api/v1/ingest/record")
 async def record_import_session(request: ImportRecordRequest):
     """Record an import session in Neo4j."""
@@ -271,7 +425,8 @@ async def record_import_session(request: ImportRecordRequest):
             total_questions: $total_questions,
             total_tags: $total_tags,
             total_pages: $total_pages,
-            tags_list: $tags_list
+            tags_list: $tags_list,
+            job_id: $job_id
         })
         """
 
@@ -282,11 +437,16 @@ async def record_import_session(request: ImportRecordRequest):
             "total_tags": len(request.tags_list),
             "total_pages": request.total_pages,
             "tags_list": request.tags_list,
+            "job_id": request.job_id,
         }
 
         # Run query in thread
         await asyncio.to_thread(get_graph_instance().query, query, params)
 
+        # Keep the log in sync with the ingestion job it records
+        if request.job_id:
+            ingest_jobs.attach_import_log(request.job_id, import_id)
+
         return {"status": "success", "import_id": import_id}
     except Exception as e:
         logger.error(f"Error recording import session: {e}")
@@ -302,7 +462,8 @@ async def update_import_session(import_id: str, request: ImportRecordRequest):
         SET log.total_questions = $total_questions,
             log.total_tags = $total_tags,
             log.total_pages = $total_pages,
-            log.tags_list = $tags_list
+            log.tags_list = $tags_list,
+            log.job_id = coalesce($job_id, log.job_id)
         RETURN log
         """
 
@@ -312,11 +473,15 @@ async def update_import_session(import_id: str, request: ImportRecordRequest):
             "total_tags": len(request.tags_list),
             "total_pages": request.total_pages,
             "tags_list": request.tags_list,
+            "job_id": request.job_id,
         }
 
         # Run query in thread
         await asyncio.to_thread(get_graph_instance().query, query, params)
 
+        if request.job_id:
+            ingest_jobs.attach_import_log(request.job_id, import_id)
+
         return {"status": "success", "message": f"Import session {import_id} updated"}
     except Exception as e:
         logger.error(f"Error updating import session: {e}")
@@ -349,207 +514,149 @@ async def delete_import_session(import_id: str):
 
 
 @app.post("/agent/ask")
-async def agent_ask(request: QueryRequest) -> StreamingResponse:
+async def agent_ask(request: QueryRequest, http_request: Request) -> StreamingResponse:
     """Endpoint to query the new LangChain Agent with SSE streaming."""
 
-    async def agent_stream_generator() -> AsyncGenerator[str]:
+    async def agent_stream_generator() -> AsyncGenerator[Dict]:
         logger.info(
             f"Agent request: '{request.question[:50]}...' from user {request.user_id}"
         )
 
-        try:
-            # 1. Prepare Input
-            # Retrieve history
-            chat_history_obj = await asyncio.to_thread(
-                get_chat_history, request.session_id
-            )
-            messages = chat_history_obj.messages if chat_history_obj else []
-
-            # Construct input for Graph Agent (expects 'messages' key in state)
-            # Add current user message to the history list
-            input_messages = messages + [HumanMessage(content=request.question)]
-            input_data = {
-                "messages": input_messages,
-                "question": request.question,
-                "session_id": request.session_id,
-                "session_topic": "",  # Middleware will populate or use default
-            }
-
-            # Save user message to DB
+        # Initialize accumulators
+        response_chunks = []
+        response_thought_chunks = []
+
+        async def save_response(truncated: bool = False) -> None:
             try:
-                # Ensure session is linked to user
-                await asyncio.to_thread(
-                    link_session_to_user,
-                    request.session_id,
-                    request.user_id,
-                    request.question,
-                )
+                full_response = "".join(response_chunks)
+                full_thought = "".join(response_thought_chunks)
+
+                if full_response:
+                    await asyncio.to_thread(
+                        add_ai_message_to_session,
+                        request.session_id,
+                        full_response,
+                        full_thought,
+                        truncated,
+                    )
+                    logger.info(f"Response saved to DB: {len(full_response)} chars")
+            except Exception as e:
+                logger.warning(f"Error saving AI response: {e}")
 
-                await asyncio.to_thread(
-                    add_user_message_to_session, request.session_id, request.question
+        # One query embedding per request, shared by the stored user message, retrieval
+        # and topic analysis; the scope is copied into the worker threads below
+        with (
+            cancellation_scope() as cancelled,
+            query_embedding_scope(f"session {request.session_id}"),
+        ):
+            try:
+                # 1. Prepare Input
+                # Retrieve history
+                chat_history_obj = await asyncio.to_thread(
+                    get_chat_history, request.session_id
+                )
+                messages = chat_history_obj.messages if chat_history_obj else []
+
+                # Construct input for Graph Agent (expects 'messages' key in state)
+                # Add current user message to the history list
+                input_messages = messages + [HumanMessage(content=request.question)]
+                input_data = {
+                    "messages": input_messages,
+                    "question": request.question,
+                    "session_id": request.session_id,
+                    "session_topic": "",  # Middleware will populate or use default
+                }
+
+                # Save user message to DB, linking the session to the user in the same write
+                try:
+                    await asyncio.to_thread(
+                        add_user_message_to_session,
+                        request.session_id,
+                        request.question,
+                        request.user_id,
+                        request.question,  # Topic, kept from the session's first question
+                    )
+                except Exception as e:
+                    logger.warning(f"Error saving user message: {e}")
+
+                # 2. Stream the agent run
+                # Built on first use unless the startup warmup already finished
+                stackexchange_agent = await asyncio.to_thread(components.get, "agent")
+                # Speculative retrieval (opt-in) overlaps with the agent's first LLM call
+                with speculative_retrieval(request.question):
+                    # Only answer tokens and named stage signals are streamed
+                    async for event in stream_agent(stackexchange_agent, input_data):
+                        yield event
+                        if event["type"] == "token":
+                            response_chunks.append(event["content"])
+                            if event["reasoning_content"]:
+                                response_thought_chunks.append(
+                                    event["reasoning_content"]
+                                )
+
+            except asyncio.CancelledError:
+                # Client gone: cancelling this task closed the Ollama request; steps
+                # already running in worker threads skip whatever comes after them
+                cancelled.set()
+                metrics.incr("agent.cancelled")
+                logger.info(
+                    f"Client disconnected, agent run for session {request.session_id} "
+                    f"cancelled after {len(response_chunks)} chunks"
                 )
+                await asyncio.shield(save_response(truncated=True))
+                raise
             except Exception as e:
-                logger.warning(f"Error saving user message: {e}")
-
-            # 2. Stream Events from Agent Executor
-            # version="v1" for langchain < 0.2, "v2" for >= 0.2
-            # checking installed version or trying v2 is safer for new setups
-
-            # Initialize accumulators
-            response_chunks = []
-            response_thought_chunks = []
-
-            async for event in stackexchange_agent.astream_events(
-                input_data, version="v2"
-            ):
-                event_type = event["event"]
-                event_name = event["name"]
-
-                # --- A. Status Updates (Tools) ---
-                if event_type == "on_tool_start":
-                    # Notify frontend that a tool is running
-                    yield f"data: {
-                        json.dumps(
-                            {
-                                'type': 'status',
-                                'stage': 'tool_start',
-                                'status': 'running',
-                                'message': f'🛠️ Using tool: {event_name}...',
-                            }
-                        )
-                    }\n\n"
-
-                elif event_type == "on_tool_end":
-                    yield f"data: {
-                        json.dumps(
-                            {
-                                'type': 'status',
-                                'stage': 'tool_end',
-                                'status': 'complete',
-                                'message': f'✅ Tool {event_name} completed',
-                            }
-                        )
-                    }\n\n"
-
-                # --- B. Internal Tool Steps (GraphTraversal & Reranking) ---
-                # These events happen *inside* the tool execution
-                elif event_type == "on_chain_start":
-                    if event_name == "GraphTraversal":
-                        yield f"data: {
-                            json.dumps(
-                                {
-                                    'type': 'status',
-                                    'stage': 'graph_traversal',
-                                    'status': 'running',
-                                    'message': '🕷️ Traversing Knowledge Graph...',
-                                }
-                            )
-                        }\n\n"
-                    elif event_name == "Reranking":
-                        yield f"data: {
-                            json.dumps(
-                                {
-                                    'type': 'status',
-                                    'stage': 'reranking',
-                                    'status': 'running',
-                                    'message': '⚖️ Reranking Documents...',
-                                }
-                            )
-                        }\n\n"
-
-                elif event_type == "on_chain_end":
-                    if event_name == "GraphTraversal":
-                        # Attempt to extract count if possible, though 'output' structure varies
-                        output = event["data"].get("output", [])
-                        count = len(output) if isinstance(output, list) else 0
-                        yield f"data: {
-                            json.dumps(
-                                {
-                                    'type': 'status',
-                                    'stage': 'graph_traversal',
-                                    'status': 'complete',
-                                    'message': f'✅ Found {count} documents',
-                                    'count': count,
-                                }
-                            )
-                        }\n\n"
-                    elif event_name == "Reranking":
-                        output = event["data"].get("output", [])
-                        count = len(output) if isinstance(output, list) else 0
-                        yield f"data: {
-                            json.dumps(
-                                {
-                                    'type': 'status',
-                                    'stage': 'reranking',
-                                    'status': 'complete',
-                                    'message': f'✅ Top {count} documents selected',
-                                    'count': count,
-                                }
-                            )
-                        }\n\n"
-
-                # --- C. Token Streaming (LLM) ---
-                # We only want tokens from the final chat model in the agent, not internal steps if possible.
-                # Usually, 'on_chat_model_stream' works for the final response generation.
-                elif event_type == "on_chat_model_stream":
-                    chunk = event["data"].get("chunk")
-                    if chunk:
-                        content = (
-                            chunk.content if hasattr(chunk, "content") else str(chunk)
-                        )
-                        # Extract reasoning content if available
-                        reasoning_chunk = (
-                            chunk.additional_kwargs.get("reasoning_content", "")
-                            if hasattr(chunk, "additional_kwargs")
-                            else ""
-                        )
-
-                        if content or reasoning_chunk:
-                            event_data = {
-                                "type": "token",
-                                "content": content,
-                                "reasoning_content": reasoning_chunk,
-                            }
-                            yield f"data: {json.dumps(event_data)}\n\n"
-
-                            # Accumulate content
-                            response_chunks.append(content)
-                            # Accumulate reasoning/thoughts if we want to save them
-                            if reasoning_chunk:
-                                response_thought_chunks.append(reasoning_chunk)
-
-                # --- D. Final Output ---
-                # 'on_chain_end' for the main executor might contain the final output,
-                # but valid streaming builds the answer token-by-token.
-
-        except Exception as e:
-            logger.error(f"Error in agent stream: {e}")
-            yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+                logger.error(f"Error in agent stream: {e}")
+                yield {"type": "error", "content": str(e)}
 
         # 3. Save AI Response to DB
-        try:
-            full_response = "".join(response_chunks)
-            full_thought = "".join(response_thought_chunks)
-
-            if full_response:
-                await asyncio.to_thread(
-                    add_ai_message_to_session,
-                    request.session_id,
-                    full_response,
-                    full_thought,
-                )
-                logger.info(f"Response saved to DB: {len(full_response)} chars")
-        except Exception as e:
-            logger.warning(f"Error saving AI response: {e}")
+        await save_response()
+
+    # A reconnect names its generation in Last-Event-ID and resumes after that event;
+    # otherwise join the session's running generation for this question or start one
+    stream_id, after = parse_last_event_id(http_request.headers.get("last-event-id"))
+    if not stream_id:
+        generation = generations.start_or_join(
+            request.session_id, request.question, agent_stream_generator
+        )
+        return _sse_response(generation, 0, http_request)
+
+    generation = generations.get(stream_id)
+    if generation is None:
+        # Expired or from another process: a new run would store the question and its
+        # answer a second time, so the client keeps its partial answer instead
+        metrics.incr("sse.resume_expired")
+        return JSONResponse(
+            status_code=410, content={"status": "error", "message": "Stream expired"}
+        )
+    metrics.incr("sse.resumes")
+    return _sse_response(generation, after, http_request)
+
+
+@app.get("/agent/stream/{stream_id}")
+async def agent_stream(stream_id: str, http_request: Request):
+    """Re-attaches to a running or recently finished generation (EventSource reconnects)."""
+    generation = generations.get(stream_id)
+    if generation is None:
+        return JSONResponse(
+            status_code=404, content={"status": "error", "message": "Unknown stream"}
+        )
+    _, after = parse_last_event_id(http_request.headers.get("last-event-id"))
+    return _sse_response(generation, after, http_request)
+
 
+def _sse_response(
+    generation: Generation, after: int, http_request: Request
+) -> StreamingResponse:
     return StreamingResponse(
-        agent_stream_generator(),
+        generation.subscribe(after, http_request.is_disconnected),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "X-Accel-Buffering": "no",
             "Connection": "keep-alive",
             "Access-Control-Allow-Origin": "*",
+            "X-Stream-Id": generation.stream_id,
         },
     )
 
@@ -0,0 +1,347 @@
+"""
+CSV generator for first-time corpus builds with `neo4j-admin database import`.
+
+Reads StackExchange API pages (JSON files as returned by /search/advanced) or an
+extracted data dump, attaches precomputed embeddings from the embedding cache and writes
+one CSV file per node label and relationship type, matching the schema written by
+`import_query`. After the offline import, `create-indexes` builds the vector and
+fulltext indexes that `create_vector_stores` attaches to.
+
+Usage (from backend/):
+    python -m ingest.bulk_csv generate --dump-dir /data/stackoverflow.com --out /data/csv
+    python -m ingest.bulk_csv generate --api-pages page1.json page2.json --out /data/csv --embed-missing
+    neo4j-admin database import full ...   # command printed by `generate`
+    python -m ingest.bulk_csv create-indexes
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from setup.init_config import (
+    create_lookup_indexes,
+    create_search_indexes,
+    embedding_dimensions,
+    embedding_model,
+    get_graph_instance,
+)
+from utils.embedding_cache import (
+    EmbeddingCache,
+    embed_documents_cached,
+    get_embedding_cache,
+)
+from ingest.dump_import import DUMP_PAGE_SIZE, DumpIndex, INDEX_FILENAME, iter_questions
+from ingest.pipeline import answer_text, prepare_items, question_text
+
+logger = logging.getLogger(__name__)
+
+ARRAY_DELIMITER = ";"
+
+# neo4j-admin headers. Each label has its own ID space, kept apart from the stored `id`
+# property so ids stay numeric; the shared "deleted" user gets its own file with a
+# string id column.
+NODE_HEADERS = {
+    "Question": [
+        ":ID(Question)",
+        "id:long",
+        "title",
+        "link",
+        "score:int",
+        "favorite_count:int",
+        "creation_date:datetime",
+        "body",
+        "content_hash",
+        "context",
+        "context_hash",
+        "embedding:float[]",
+    ],
+    "Answer": [
+        ":ID(Answer)",
+        "id:long",
+        "is_accepted:boolean",
+        "score:int",
+        "creation_date:datetime",
+        "body",
+        "content_hash",
+        "embedding:float[]",
+    ],
+    "Tag": ["name:ID(Tag)"],
+    "User": [":ID(User)", "id:long", "display_name", "reputation:int"],
+    "DeletedUser": [":ID(User)", "id", "display_name"],
+}
+RELATIONSHIP_HEADERS = {
+    "TAGGED": [":START_ID(Question)", ":END_ID(Tag)"],
+    "ANSWERS": [":START_ID(Answer)", ":END_ID(Question)"],
+    "PROVIDED": [":START_ID(User)", ":END_ID(Answer)"],
+    "ASKED": [":START_ID(User)", ":END_ID(Question)"],
+}
+
+
+def _datetime(epoch_seconds: Optional[int]) -> str:
+    if epoch_seconds is None:
+        return ""
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).strftime(
+        "%Y-%m-%dT%H:%M:%SZ"
+    )
+
+
+def _vector(vector: Optional[List[float]]) -> str:
+    return ARRAY_DELIMITER.join(repr(float(x)) for x in vector) if vector else ""
+
+
+# ===========================================================================================================================================================
+# Inputs
+# ===========================================================================================================================================================
+def iter_api_pages(paths: List[str]) -> Iterator[List[Dict]]:
+    """Yields the items of saved StackExchange API responses, one page per file."""
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            yield json.load(f).get("items", [])
+
+
+def iter_dump_pages(dump_dir: str, site_url: str, index_path: Optional[str] = None):
+    """Yields pages of API-shaped items from an extracted data dump."""
+    index = DumpIndex(index_path or os.path.join(dump_dir, INDEX_FILENAME))
+    posts_path = os.path.join(dump_dir, "Posts.xml")
+    if index.get_meta("indexed") != "1":
+        users_path = os.path.join(dump_dir, "Users.xml")
+        if os.path.exists(users_path):
+            index.index_users(users_path)
+        index.index_answers(posts_path)
+        index.set_meta("indexed", 1)
+
+    page: List[Dict] = []
+    for item in iter_questions(posts_path, index, site_url):
+        page.append(item)
+        if len(page) >= DUMP_PAGE_SIZE:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def attach_embeddings(items: List[Dict], embed_missing: bool) -> int:
+    """
+    Sets `embedding` on questions and answers from the embedding cache, embedding
+    misses only when `embed_missing` is set. Returns the number still missing.
+    """
+    targets = [(question_text(q), q) for q in items]
+    targets += [(answer_text(q, a), a) for q in items for a in q.get("answers", [])]
+    texts = [text for text, _ in targets]
+
+    if embed_missing:
+        vectors = embed_documents_cached(texts)
+    else:
+        model_name = embedding_model().model
+        vectors = get_embedding_cache().get_many(
+            [EmbeddingCache.make_key(model_name, text) for text in texts]
+        )
+
+    missing = 0
+    for (_, target), vector in zip(targets, vectors):
+        target["embedding"] = vector
+        missing += vector is None
+    return missing
+
+
+# ===========================================================================================================================================================
+# CSV writer
+# ===========================================================================================================================================================
+class BulkCsvWriter:
+    """Writes one headed CSV per node label and relationship type into `out_dir`."""
+
+    def __init__(self, out_dir: str):
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self._files = {}
+        self._writers = {}
+        for name, header in {**NODE_HEADERS, **RELATIONSHIP_HEADERS}.items():
+            f = open(self.path(name), "w", newline="", encoding="utf-8")
+            self._files[name] = f
+            self._writers[name] = csv.writer(f)
+            self._writers[name].writerow(header)
+        # Tags and users are shared across questions; each is written once
+        self._tags = set()
+        self._users = set()
+        self.counts: Dict[str, int] = {name: 0 for name in self._writers}
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.out_dir, f"{name.lower()}.csv")
+
+    def _row(self, name: str, row: List) -> None:
+        self._writers[name].writerow(row)
+        self.counts[name] += 1
+
+    def _user(self, owner: Dict) -> str:
+        """Writes the user once and returns its node id in the User ID space."""
+        user_id = owner.get("user_id")
+        if user_id is None:
+            if "deleted" not in self._users:
+                self._users.add("deleted")
+                self._row("DeletedUser", ["deleted", "deleted", None])
+            return "deleted"
+        if user_id not in self._users:
+            self._users.add(user_id)
+            self._row(
+                "User",
+                [user_id, user_id, owner.get("display_name"), owner.get("reputation")],
+            )
+        return str(user_id)
+
+    def write_question(self, q: Dict) -> None:
+        qid = q["question_id"]
+        self._row(
+            "Question",
+            [
+                qid,
+                qid,
+                q.get("title"),
+                q.get("link"),
+                q.get("score"),
+                q.get("favorite_count"),
+                _datetime(q.get("creation_date")),
+                q.get("body_markdown"),
+                q.get("content_hash"),
+                q.get("context"),
+                q.get("context_hash"),
+                _vector(q.get("embedding")),
+            ],
+        )
+        for tag in q.get("tags", []):
+            if tag not in self._tags:
+                self._tags.add(tag)
+                self._row("Tag", [tag])
+            self._row("TAGGED", [qid, tag])
+
+        # Matches import_query: only questions with a known owner get ASKED
+        if (q.get("owner") or {}).get("user_id") is not None:
+            self._row("ASKED", [self._user(q["owner"]), qid])
+
+        for a in q.get("answers", []):
+            self._row(
+                "Answer",
+                [
+                    a["answer_id"],
+                    a["answer_id"],
+                    bool(a.get("is_accepted")),
+                    a.get("score"),
+                    _datetime(a.get("creation_date")),
+                    a.get("body_markdown"),
+                    a.get("content_hash"),
+                    _vector(a.get("embedding")),
+                ],
+            )
+            self._row("ANSWERS", [a["answer_id"], qid])
+            self._row("PROVIDED", [self._user(a.get("owner") or {}), a["answer_id"]])
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+
+    def import_command(self, database: str = "neo4j") -> str:
+        """The neo4j-admin command that loads the generated files."""
+        args = [
+            "neo4j-admin database import full",
+            f"--array-delimiter='{ARRAY_DELIMITER}'",
+            "--multiline-fields=true",
+            f"--nodes=Question={self.path('Question')}",
+            f"--nodes=Answer={self.path('Answer')}",
+            f"--nodes=Tag={self.path('Tag')}",
+            f"--nodes=User={self.path('User')}",
+            f"--nodes=User={self.path('DeletedUser')}",
+        ]
+        args += [
+            f"--relationships={name}={self.path(name)}" for name in RELATIONSHIP_HEADERS
+        ]
+        return " \\\n  ".join(args + [database])
+
+
+def generate(
+    pages: Iterator[List[Dict]], out_dir: str, embed_missing: bool = False
+) -> Dict[str, int]:
+    """Writes all pages as neo4j-admin CSV files and returns the per-file row counts."""
+    writer = BulkCsvWriter(out_dir)
+    seen_questions = set()
+    missing = 0
+    try:
+        for page in pages:
+            # Questions repeated across pages (e.g. several tags) are written once
+            items = [q for q in page if q.get("question_id") not in seen_questions]
+            seen_questions.update(q.get("question_id") for q in items)
+            if not items:
+                continue
+            items = prepare_items(items)
+            missing += attach_embeddings(items, embed_missing)
+            for q in items:
+                writer.write_question(q)
+            logger.info(f"Wrote {len(seen_questions)} questions to {out_dir}")
+    finally:
+        writer.close()
+
+    if missing:
+        logger.warning(
+            f"{missing} questions/answers have no precomputed embedding; "
+            "rerun with --embed-missing or let the backend embed them after import"
+        )
+    print(writer.import_command())
+    return writer.counts
+
+
+def create_indexes(dimensions: Optional[int] = None) -> None:
+    """Creates lookup, vector and fulltext indexes on the freshly imported database."""
+    if dimensions is None:
+        # Same source as the startup attach path, so both agree on index dimensions
+        dimensions = embedding_dimensions()
+    graph = get_graph_instance()
+    create_lookup_indexes(graph)
+    create_search_indexes(graph, dimensions)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Generate neo4j-admin import files and create search indexes."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="Write node and relationship CSV files")
+    source = gen.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dump-dir", help="Extracted StackExchange data dump")
+    source.add_argument("--api-pages", nargs="+", help="Saved API response JSON files")
+    gen.add_argument("--out", required=True, help="Output directory for the CSV files")
+    gen.add_argument("--site-url", default="https://stackoverflow.com")
+    gen.add_argument("--index-path", help="SQLite join index for --dump-dir")
+    gen.add_argument(
+        "--embed-missing",
+        action="store_true",
+        help="Embed texts missing from the embedding cache (needs Ollama)",
+    )
+
+    idx = commands.add_parser("create-indexes", help="Create indexes after the import")
+    idx.add_argument(
+        "--dimensions",
+        type=int,
+        help="Embedding dimensions (default: EMBEDDING_DIMENSIONS, else probe the embedding model)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    if args.command == "generate":
+        pages = (
+            iter_dump_pages(args.dump_dir, args.site_url, args.index_path)
+            if args.dump_dir
+            else iter_api_pages(args.api_pages)
+        )
+        counts = generate(pages, args.out, args.embed_missing)
+        print(f"Rows written: {counts}")
+    else:
+        create_indexes(args.dimensions)
+
+
+if __name__ == "__main__":
+    main()
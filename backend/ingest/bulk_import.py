@@ -0,0 +1,127 @@
+"""Deadlock-safe bulk writes: hot nodes, then questions/answers, then relationships"""
+
+import logging
+import os
+import random
+import time
+from typing import Dict, List
+
+from dotenv import load_dotenv
+from neo4j.exceptions import Neo4jError, TransientError
+
+from setup.init_config import get_graph_instance
+from utils.metrics import metrics
+from ingest.queries import (
+    bulk_merge_tags_query,
+    bulk_merge_users_query,
+    bulk_merge_questions_query,
+    bulk_link_tagged_query,
+    bulk_link_asked_query,
+    bulk_link_provided_query,
+)
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+INGEST_TX_BATCH_SIZE = int(os.getenv("INGEST_TX_BATCH_SIZE") or 500)
+INGEST_WRITE_RETRIES = int(os.getenv("INGEST_WRITE_RETRIES") or 5)
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    True for transient errors (e.g. deadlocks), including those raised inside an inner
+    `IN TRANSACTIONS` batch, which surface wrapped in a DatabaseError / ClientError.
+    """
+    while error is not None:
+        if isinstance(error, TransientError):
+            return True
+        if isinstance(error, Neo4jError) and "Neo.TransientError." in (
+            f"{error.code} {error.message}"
+        ):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def run_with_retry(query: str, rows: List[Dict]) -> None:
+    """
+    Runs an idempotent batched write in an auto-commit session, retrying transient
+    errors. `CALL {…} IN TRANSACTIONS` cannot run in a managed transaction, so the
+    query goes to the driver directly instead of through Neo4jGraph.query.
+    """
+    graph = get_graph_instance()
+    params = {"rows": rows, "batch_size": INGEST_TX_BATCH_SIZE}
+    for attempt in range(INGEST_WRITE_RETRIES):
+        try:
+            with graph._driver.session(database=graph._database) as session:
+                session.run(query, params).consume()
+            return
+        except Neo4jError as e:
+            if not is_transient(e) or attempt == INGEST_WRITE_RETRIES - 1:
+                raise
+            delay = 0.2 * 2**attempt + random.uniform(0, 0.1)
+            metrics.incr("ingest.write_retries")
+            logger.warning(
+                f"Transient error on bulk write (attempt {attempt + 1}), retrying in {delay:.2f}s: {e}"
+            )
+            time.sleep(delay)
+
+
+def write_sorted(query: str, rows: List[Dict], key: str) -> None:
+    """
+    Writes rows touching hot nodes in one query, sorted by the hot-node key. Every
+    writer, in any process, then locks shared Tags / Users in the same order, so
+    concurrent batches wait on each other instead of deadlocking.
+    """
+    if rows:
+        run_with_retry(query, sorted(rows, key=lambda r: str(r[key])))
+
+
+def bulk_write(items: List[Dict]) -> None:
+    """
+    Writes a batch of questions in three steps: distinct tags and users, then
+    questions with their answers, then the TAGGED / ASKED / PROVIDED relationships.
+    """
+    tags = {tag for q in items for tag in q.get("tags", [])}
+    users: Dict[object, Dict] = {}
+    tagged, asked, provided = [], [], []
+
+    for q in items:
+        tagged += [
+            {"question_id": q["question_id"], "tag": tag} for tag in q.get("tags", [])
+        ]
+        owner = q.get("owner") or {}
+        if owner.get("user_id") is not None:
+            users.setdefault(owner["user_id"], owner)
+            asked.append({"user_id": owner["user_id"], "question_id": q["question_id"]})
+        for a in q.get("answers", []):
+            answerer = a.get("owner") or {}
+            user_id = answerer.get("user_id") or "deleted"
+            users.setdefault(user_id, answerer)
+            provided.append({"user_id": user_id, "answer_id": a["answer_id"]})
+
+    user_rows = [
+        {
+            "id": user_id,
+            "display_name": owner.get("display_name"),
+            "reputation": owner.get("reputation"),
+        }
+        for user_id, owner in users.items()
+    ]
+
+    # 1. Hot nodes, merged once per batch
+    with metrics.timer("ingest.write.hot_nodes", items=len(tags) + len(user_rows)):
+        write_sorted(bulk_merge_tags_query, [{"name": t} for t in tags], "name")
+        write_sorted(bulk_merge_users_query, user_rows, "id")
+
+    # 2. Questions and answers: owned by this batch, no ordering needed
+    with metrics.timer("ingest.write.questions", items=len(items)):
+        run_with_retry(bulk_merge_questions_query, items)
+
+    # 3. Relationships to hot nodes
+    with metrics.timer(
+        "ingest.write.relationships", items=len(tagged) + len(asked) + len(provided)
+    ):
+        write_sorted(bulk_link_tagged_query, tagged, "tag")
+        write_sorted(bulk_link_asked_query, asked, "user_id")
+        write_sorted(bulk_link_provided_query, provided, "user_id")
@@ -0,0 +1,379 @@
+"""
+Offline importer for the official StackExchange data dumps (Posts.xml, Users.xml, Tags.xml).
+
+The XML files are stream-parsed with constant memory. Answers and users go into an
+on-disk SQLite index first, then questions are streamed in Id order, joined with their
+answers and owners, and fed page by page into the same path as /api/v1/ingest.
+The last written question Id is checkpointed after every page, so an interrupted
+import resumes where it stopped.
+
+Usage (from backend/):
+    python -m ingest.dump_import setup/data/sample_dump --dry-run
+    python -m ingest.dump_import /data/stackoverflow.com --tag python --tag neo4j
+"""
+
+import argparse
+import html
+import logging
+import os
+import re
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DUMP_PAGE_SIZE = 100  # Questions per process_ingestion call, like one API page
+INDEX_FILENAME = ".dump_import_index.sqlite3"
+
+_TAG_RE = re.compile(r"<([^<>]+)>|\|([^|]+)")
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+
+
+# ===========================================================================================================================================================
+# XML streaming and field conversion
+# ===========================================================================================================================================================
+def iter_rows(path: str) -> Iterator[Dict[str, str]]:
+    """Yields the attributes of every <row> element, clearing parsed elements as it goes."""
+    context = ET.iterparse(path, events=("start", "end"))
+    _, root = next(context)
+    for event, elem in context:
+        if event == "end" and elem.tag == "row":
+            yield dict(elem.attrib)
+            # Drop the element and its reference from the root to keep memory constant
+            elem.clear()
+            root.clear()
+
+
+def parse_dump_date(value: Optional[str]) -> Optional[int]:
+    """Converts a dump timestamp (e.g. 2008-07-31T21:42:52.667) to epoch seconds."""
+    if not value:
+        return None
+    return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp())
+
+
+def parse_tags(value: Optional[str]) -> List[str]:
+    """Parses both dump tag formats: '<python><neo4j>' and '|python|neo4j|'."""
+    if not value:
+        return []
+    return [a or b for a, b in _TAG_RE.findall(value)]
+
+
+def html_to_text(body: Optional[str]) -> str:
+    """Approximates the API's body_markdown from the dump's rendered HTML body."""
+    if not body:
+        return ""
+    text = re.sub(r"<pre[^>]*><code>", "\n```\n", body)
+    text = re.sub(r"\n?</code></pre>", "\n```\n", text)
+    text = re.sub(r"</?code>", "`", text)
+    text = re.sub(r"<br\s*/?>|</p>|</li>|</h\d>", "\n", text)
+    text = html.unescape(_HTML_TAG_RE.sub("", text))
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def _int(value: Optional[str], default: Optional[int] = None) -> Optional[int]:
+    return int(value) if value not in (None, "") else default
+
+
+# ===========================================================================================================================================================
+# On-disk index and checkpoints
+# ===========================================================================================================================================================
+class DumpIndex:
+    """
+    SQLite index of users and answers keyed for the question join, plus import
+    checkpoints. Memory stays bounded regardless of dump size.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY, display_name TEXT, reputation INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY, parent_id INTEGER NOT NULL, score INTEGER,
+                creation_date INTEGER, body TEXT, owner_user_id INTEGER, owner_display_name TEXT
+            );
+            CREATE INDEX IF NOT EXISTS answers_parent ON answers (parent_id);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        self._conn.commit()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value))
+        )
+        self._conn.commit()
+
+    def reset(self) -> None:
+        self._conn.executescript(
+            "DELETE FROM users; DELETE FROM answers; DELETE FROM meta;"
+        )
+        self._conn.commit()
+
+    def index_users(self, users_path: str, chunk: int = 10000) -> int:
+        count, rows = 0, []
+        for row in iter_rows(users_path):
+            rows.append(
+                (
+                    _int(row.get("Id")),
+                    row.get("DisplayName"),
+                    _int(row.get("Reputation")),
+                )
+            )
+            if len(rows) >= chunk:
+                count += self._insert("users", rows)
+                rows = []
+        count += self._insert("users", rows)
+        return count
+
+    def index_answers(self, posts_path: str, chunk: int = 10000) -> int:
+        count, rows = 0, []
+        for row in iter_rows(posts_path):
+            if row.get("PostTypeId") != "2":
+                continue
+            rows.append(
+                (
+                    _int(row.get("Id")),
+                    _int(row.get("ParentId")),
+                    _int(row.get("Score"), 0),
+                    parse_dump_date(row.get("CreationDate")),
+                    row.get("Body"),
+                    _int(row.get("OwnerUserId")),
+                    row.get("OwnerDisplayName"),
+                )
+            )
+            if len(rows) >= chunk:
+                count += self._insert("answers", rows)
+                rows = []
+        count += self._insert("answers", rows)
+        return count
+
+    def _insert(self, table: str, rows: List[tuple]) -> int:
+        if rows:
+            placeholders = ",".join("?" * len(rows[0]))
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {table} VALUES ({placeholders})", rows
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def owner(self, user_id: Optional[int], display_name: Optional[str]) -> Dict:
+        """Builds an API-shaped owner; deleted users have no user_id, as in the API."""
+        if user_id is None:
+            return {"display_name": display_name}
+        row = self._conn.execute(
+            "SELECT display_name, reputation FROM users WHERE id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return {"user_id": user_id, "display_name": display_name}
+        return {"user_id": user_id, "display_name": row[0], "reputation": row[1]}
+
+    def answers_for(self, question_id: int, accepted_id: Optional[int]) -> List[Dict]:
+        rows = self._conn.execute(
+            "SELECT id, score, creation_date, body, owner_user_id, owner_display_name "
+            "FROM answers WHERE parent_id = ? ORDER BY id",
+            (question_id,),
+        ).fetchall()
+        return [
+            {
+                "answer_id": answer_id,
+                "is_accepted": answer_id == accepted_id,
+                "score": score,
+                "creation_date": creation_date,
+                "body_markdown": html_to_text(body),
+                "owner": self.owner(owner_user_id, owner_display_name),
+            }
+            for answer_id, score, creation_date, body, owner_user_id, owner_display_name in rows
+        ]
+
+
+# ===========================================================================================================================================================
+# Question stream
+# ===========================================================================================================================================================
+def iter_questions(
+    posts_path: str,
+    index: DumpIndex,
+    site_url: str,
+    after_id: int = 0,
+    tags: Optional[Set[str]] = None,
+    min_answers: int = 1,
+) -> Iterator[Dict]:
+    """
+    Streams questions from Posts.xml as StackExchange API items, skipping those
+    up to `after_id` (Posts.xml is ordered by Id) and, optionally, by tag.
+    """
+    for row in iter_rows(posts_path):
+        if row.get("PostTypeId") != "1":
+            continue
+        question_id = _int(row.get("Id"))
+        if question_id <= after_id:
+            continue
+        question_tags = parse_tags(row.get("Tags"))
+        if tags and not tags.intersection(question_tags):
+            continue
+
+        answers = index.answers_for(question_id, _int(row.get("AcceptedAnswerId")))
+        # The API loader only asks for answered questions (answers=1)
+        if len(answers) < min_answers:
+            continue
+
+        yield {
+            "question_id": question_id,
+            "title": html.unescape(row.get("Title", "")),
+            "link": f"{site_url.rstrip('/')}/questions/{question_id}",
+            "score": _int(row.get("Score"), 0),
+            "favorite_count": _int(row.get("FavoriteCount"), 0),
+            "creation_date": parse_dump_date(row.get("CreationDate")),
+            "body_markdown": html_to_text(row.get("Body")),
+            "tags": question_tags,
+            "owner": index.owner(
+                _int(row.get("OwnerUserId")), row.get("OwnerDisplayName")
+            ),
+            "answers": answers,
+        }
+
+
+def load_tag_names(tags_path: str) -> Set[str]:
+    return {row["TagName"] for row in iter_rows(tags_path) if row.get("TagName")}
+
+
+def import_dump(
+    dump_dir: str,
+    site_url: str = "https://stackoverflow.com",
+    page_size: int = DUMP_PAGE_SIZE,
+    index_path: Optional[str] = None,
+    tags: Optional[Set[str]] = None,
+    limit: Optional[int] = None,
+    reset: bool = False,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """
+    Imports a StackExchange dump directory. Returns the summed ingestion summary.
+    With `dry_run`, items are parsed and counted but nothing is embedded or written.
+    """
+    posts_path = os.path.join(dump_dir, "Posts.xml")
+    users_path = os.path.join(dump_dir, "Users.xml")
+    tags_path = os.path.join(dump_dir, "Tags.xml")
+
+    index = DumpIndex(index_path or os.path.join(dump_dir, INDEX_FILENAME))
+    if reset:
+        index.reset()
+
+    if os.path.exists(tags_path) and tags:
+        unknown = tags - load_tag_names(tags_path)
+        if unknown:
+            logger.warning(f"Tags not found in Tags.xml: {sorted(unknown)}")
+
+    # 1. Build the on-disk join index once; it survives restarts
+    if index.get_meta("indexed") != "1":
+        start = time.perf_counter()
+        users = index.index_users(users_path) if os.path.exists(users_path) else 0
+        answers = index.index_answers(posts_path)
+        index.set_meta("indexed", 1)
+        logger.info(
+            f"Indexed {users} users and {answers} answers in {time.perf_counter() - start:.1f}s"
+        )
+
+    if dry_run:
+        process_page = lambda page: {"count": len(page)}  # noqa: E731
+    else:
+        # Imported here so --dry-run works without Neo4j or Ollama
+        from ingest.pipeline import process_ingestion as process_page
+
+    # 2. Stream questions page by page, checkpointing after each written page
+    after_id = 0 if dry_run else int(index.get_meta("last_question_id") or 0)
+    if after_id:
+        logger.info(f"Resuming after question {after_id}")
+
+    totals: Dict[str, int] = {}
+    page: List[Dict] = []
+    seen = 0
+    start = time.perf_counter()
+
+    def flush() -> None:
+        summary = process_page(page)
+        for key, value in summary.items():
+            totals[key] = totals.get(key, 0) + value
+        if not dry_run:
+            index.set_meta("last_question_id", page[-1]["question_id"])
+        logger.info(
+            f"Imported {seen} questions up to id {page[-1]['question_id']} "
+            f"({seen / (time.perf_counter() - start):.1f} questions/s)"
+        )
+
+    for item in iter_questions(posts_path, index, site_url, after_id, tags):
+        page.append(item)
+        seen += 1
+        if len(page) >= page_size:
+            flush()
+            page = []
+        if limit and seen >= limit:
+            break
+    if page:
+        flush()
+
+    return totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Import a StackExchange data dump (Posts.xml, Users.xml, Tags.xml) into Neo4j."
+    )
+    parser.add_argument(
+        "dump_dir", help="Directory containing the extracted dump files"
+    )
+    parser.add_argument(
+        "--site-url",
+        default="https://stackoverflow.com",
+        help="Site base URL used to build question links",
+    )
+    parser.add_argument("--page-size", type=int, default=DUMP_PAGE_SIZE)
+    parser.add_argument(
+        "--index-path", help=f"SQLite join index (default: <dump_dir>/{INDEX_FILENAME})"
+    )
+    parser.add_argument(
+        "--tag",
+        action="append",
+        dest="tags",
+        help="Only import questions with this tag",
+    )
+    parser.add_argument("--limit", type=int, help="Stop after this many questions")
+    parser.add_argument(
+        "--reset", action="store_true", help="Rebuild the index and drop the checkpoint"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Parse and count without writing"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    totals = import_dump(
+        args.dump_dir,
+        site_url=args.site_url,
+        page_size=args.page_size,
+        index_path=args.index_path,
+        tags=set(args.tags) if args.tags else None,
+        limit=args.limit,
+        reset=args.reset,
+        dry_run=args.dry_run,
+    )
+    print(f"Dump import finished: {totals}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""Asynchronous ingestion jobs: a bounded worker pool with progress streaming"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from setup.init_config import get_graph_instance
+from ingest.pipeline import process_ingestion
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS") or 2)
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE") or 64)
+MAX_FINISHED_JOBS = 100  # Finished jobs kept in memory for status lookups
+# Unfinished jobs without any progress for this long are expired (e.g. a client that
+# never submitted all of its pages)
+INGEST_JOB_IDLE_SECONDS = float(os.getenv("INGEST_JOB_IDLE_SECONDS") or 1800)
+# Progress streams repeat the current snapshot after this long without a change
+INGEST_STREAM_KEEPALIVE_SECONDS = 15
+FINAL_STATUSES = ("completed", "failed", "expired")
+
+# Copies the final job counters onto the ImportLog attached to the job
+import_log_sync_query = """
+MATCH (log:ImportLog {id: $import_id})
+SET log.job_id = $job_id,
+    log.job_status = $status,
+    log.items_written = $items_written,
+    log.created = $created,
+    log.updated = $updated,
+    log.skipped = $skipped,
+    log.items_per_second = $items_per_second
+"""
+
+
+@dataclass
+class IngestJob:
+    """Progress of one ingestion job, made of one or more submitted pages."""
+
+    job_id: str
+    expected_pages: int
+    import_id: Optional[str] = None
+    status: str = "queued"
+    pages_submitted: int = 0
+    pages_done: int = 0
+    pages_failed: int = 0
+    items_received: int = 0
+    items_written: int = 0
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    embedded: int = 0
+    errors: List[str] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    subscribers: List[asyncio.Queue] = field(default_factory=list, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.pages_done + self.pages_failed >= self.expected_pages
+
+    def snapshot(self) -> Dict:
+        elapsed = 0.0
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "job_id": self.job_id,
+            "import_id": self.import_id,
+            "status": self.status,
+            "expected_pages": self.expected_pages,
+            "pages_submitted": self.pages_submitted,
+            "pages_done": self.pages_done,
+            "pages_failed": self.pages_failed,
+            "items_received": self.items_received,
+            "items_written": self.items_written,
+            "created": self.created,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "embedded": self.embedded,
+            "items_per_second": round(self.items_received / elapsed, 2)
+            if elapsed
+            else 0.0,
+            "elapsed_seconds": round(elapsed, 2),
+            "errors": self.errors[-20:],
+        }
+
+
+class IngestJobManager:
+    """
+    Queues submitted pages and processes them with a bounded pool of workers, so
+    embedding one page overlaps with writing another. Progress is published to
+    subscribers of each job for SSE streaming.
+    """
+
+    def __init__(
+        self, workers: int = INGEST_WORKERS, queue_size: int = INGEST_QUEUE_SIZE
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.jobs: Dict[str, IngestJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"ingest-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Started {self.workers} ingestion workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def create_job(self, expected_pages: int = 1) -> IngestJob:
+        self._expire_idle_jobs()
+        self._prune_finished_jobs()
+        job = IngestJob(job_id=str(uuid.uuid4()), expected_pages=max(1, expected_pages))
+        self.jobs[job.job_id] = job
+        return job
+
+    def submit_page(self, job_id: str, items: List[Dict]) -> IngestJob:
+        """
+        Enqueues a page for a job without waiting for it to be processed.
+        Raises KeyError for unknown jobs and asyncio.QueueFull when saturated.
+        """
+        if self._queue is None:
+            raise RuntimeError("Ingestion workers are not running")
+        job = self.jobs[job_id]
+        self._queue.put_nowait((job, items))
+        job.pages_submitted += 1
+        job.items_received += len(items)
+        self._publish(job)
+        return job
+
+    async def fail_page(self, job_id: str, error: str) -> IngestJob:
+        """
+        Counts a page that never reached the queue (rejected or lost on the client) as
+        failed, so the job can still finish. Raises KeyError for unknown jobs.
+        """
+        job = self.jobs[job_id]
+        job.pages_failed += 1
+        job.errors.append(error)
+        await self._finish_if_done(job)
+        self._publish(job)
+        return job
+
+    def attach_import_log(self, job_id: str, import_id: str) -> None:
+        """Links an ImportLog to a job; finished jobs sync their counters right away."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            logger.warning(f"Cannot attach ImportLog {import_id}: unknown job {job_id}")
+            return
+        job.import_id = import_id
+        if job.finished:
+            asyncio.create_task(self._sync_import_log(job))
+
+    async def stream(self, job_id: str) -> AsyncGenerator[Dict]:
+        """
+        Yields job snapshots on every change until the job finishes, repeating the last
+        one as a keepalive so clients can use a finite read timeout.
+        """
+        job = self.jobs[job_id]
+        updates: asyncio.Queue = asyncio.Queue()
+        job.subscribers.append(updates)
+        try:
+            snapshot = job.snapshot()
+            yield snapshot
+            while snapshot["status"] not in FINAL_STATUSES:
+                try:
+                    snapshot = await asyncio.wait_for(
+                        updates.get(), INGEST_STREAM_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    self._expire_idle_jobs()
+                    snapshot = job.snapshot()
+                yield snapshot
+        finally:
+            job.subscribers.remove(updates)
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            job, items = await self._queue.get()
+            try:
+                if job.started_at is None:
+                    job.started_at = time.time()
+                    job.status = "running"
+                    self._publish(job)
+
+                if items:
+                    summary = await asyncio.to_thread(process_ingestion, items)
+                    job.items_written += summary["count"]
+                    job.created += summary["created"]
+                    job.updated += summary["updated"]
+                    job.skipped += summary["skipped"]
+                    job.embedded += summary["embedded"]
+                job.pages_done += 1
+            except Exception as e:
+                logger.error(
+                    f"Ingest worker {worker_id} failed on job {job.job_id}: {e}"
+                )
+                job.pages_failed += 1
+                job.errors.append(str(e))
+            finally:
+                await self._finish_if_done(job)
+                self._publish(job)
+                self._queue.task_done()
+
+    async def _finish_if_done(self, job: IngestJob) -> None:
+        if job.finished and job.finished_at is None:
+            job.finished_at = time.time()
+            # Partial failures still complete; their errors stay on the job
+            job.status = "failed" if not job.pages_done else "completed"
+            await self._sync_import_log(job)
+
+    async def _sync_import_log(self, job: IngestJob) -> None:
+        if not job.import_id:
+            return
+        snapshot = job.snapshot()
+        try:
+            await asyncio.to_thread(
+                get_graph_instance().query,
+                import_log_sync_query,
+                {
+                    "import_id": job.import_id,
+                    "job_id": job.job_id,
+                    "status": job.status,
+                    "items_written": job.items_written,
+                    "created": job.created,
+                    "updated": job.updated,
+                    "skipped": job.skipped,
+                    "items_per_second": snapshot["items_per_second"],
+                },
+            )
+        except Exception as e:
+            logger.error(f"Error syncing ImportLog {job.import_id}: {e}")
+
+    def _publish(self, job: IngestJob) -> None:
+        job.updated_at = time.time()
+        snapshot = job.snapshot()
+        for subscriber in job.subscribers:
+            subscriber.put_nowait(snapshot)
+
+    def _expire_idle_jobs(self) -> None:
+        cutoff = time.time() - INGEST_JOB_IDLE_SECONDS
+        for job in list(self.jobs.values()):
+            if job.finished_at is None and job.updated_at < cutoff:
+                outstanding = job.expected_pages - job.pages_done - job.pages_failed
+                job.status = "expired"
+                job.finished_at = time.time()
+                job.errors.append(
+                    f"No progress for {INGEST_JOB_IDLE_SECONDS:.0f}s, "
+                    f"expired with {outstanding} pages outstanding"
+                )
+                logger.warning(f"Ingest job {job.job_id} expired")
+                self._publish(job)
+
+    def _prune_finished_jobs(self) -> None:
+        finished = [job for job in self.jobs.values() if job.finished_at is not None]
+        finished.sort(key=lambda job: job.finished_at)
+        for job in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job.job_id]
+
+
+# Process-wide job manager, started and stopped with the FastAPI app
+ingest_jobs = IngestJobManager()
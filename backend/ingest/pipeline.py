@@ -0,0 +1,252 @@
+"""Ingestion of StackExchange questions: hashing, embedding and Neo4j writes"""
+
+import hashlib
+import logging
+import os
+import queue
+import threading
+from typing import Dict, Iterator, List, Tuple
+
+from dotenv import load_dotenv
+
+from setup.init_config import get_graph_instance
+from utils.embedding_cache import embed_documents_cached
+from utils.metrics import metrics
+from utils.util import render_question_context
+from ingest.bulk_import import bulk_write
+from ingest.queries import (
+    import_query,
+    known_items_query,
+    top_questions_refresh_query,
+    TOP_QUESTIONS_FANOUT_CAP,
+)
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# Micro-batch limits: estimated embedding tokens and questions per batch
+INGEST_BATCH_TOKENS = int(os.getenv("INGEST_BATCH_TOKENS") or 16000)
+INGEST_BATCH_MAX_ITEMS = int(os.getenv("INGEST_BATCH_MAX_ITEMS") or 50)
+PIPELINE_QUEUE_SIZE = 2  # Embedded batches waiting for the writer
+# "merge" (default): one import_query per micro-batch; "bulk" (opt-in): three-step
+# batched writes for large loads with several concurrent writers
+INGEST_WRITE_MODE = os.getenv("INGEST_WRITE_MODE") or "merge"
+
+# (question, [(text to embed, dict receiving the embedding), ...])
+MicroBatch = List[Tuple[Dict, List[Tuple[str, Dict]]]]
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 of the exact text sent to the embedding model."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def question_text(q: Dict) -> str:
+    return q.get("title", "") + "\n" + q.get("body_markdown", "")
+
+
+def answer_text(q: Dict, a: Dict) -> str:
+    # Answers are embedded together with their question for context
+    return question_text(q) + "\n" + a.get("body_markdown", "")
+
+
+def prepare_items(items: List[Dict]) -> List[Dict]:
+    """
+    De-duplicates questions by id (the same question can appear under several tags)
+    and attaches content hashes and the materialized context document.
+    """
+    unique = {q.get("question_id"): q for q in items}
+    for q in unique.values():
+        q["content_hash"] = content_hash(question_text(q))
+        for a in q.get("answers", []):
+            a["content_hash"] = content_hash(answer_text(q, a))
+        q["context"], q["context_hash"] = render_question_context(q)
+    return list(unique.values())
+
+
+def classify_items(items: List[Dict]) -> Dict[str, List]:
+    """
+    Looks up which questions and answers already exist with the same content hash.
+
+    Returns the created / updated / skipped buckets and, per question id, the texts
+    that actually need an embedding.
+    """
+    rows = get_graph_instance().query(
+        known_items_query,
+        params={"question_ids": [q.get("question_id") for q in items]},
+    )
+    known = {row["question_id"]: row for row in rows}
+
+    result = {"created": [], "updated": [], "skipped": [], "to_embed": {}}
+    for q in items:
+        row = known.get(q.get("question_id"))
+        known_answers = dict(row["answers"]) if row else {}
+
+        question_changed = row is None or row["content_hash"] != q["content_hash"]
+        changed_answers = [
+            a
+            for a in q.get("answers", [])
+            if known_answers.get(a.get("answer_id")) != a["content_hash"]
+        ]
+
+        if row is None:
+            result["created"].append(q)
+        elif (
+            question_changed
+            or changed_answers
+            or row["context_hash"] != q["context_hash"]
+        ):
+            result["updated"].append(q)
+        else:
+            result["skipped"].append(q)
+            continue
+
+        # Only new or changed texts are embedded; unchanged vectors stay in the graph
+        texts = [(question_text(q), q)] if question_changed else []
+        texts += [(answer_text(q, a), a) for a in changed_answers]
+        result["to_embed"][q.get("question_id")] = texts
+
+    return result
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough heuristic (~4 characters per token), good enough to size batches
+    return len(text) // 4 + 1
+
+
+def micro_batches(
+    items: List[Dict], to_embed: Dict[object, List[Tuple[str, Dict]]]
+) -> Iterator[MicroBatch]:
+    """
+    Splits questions into micro-batches bounded by estimated embedding tokens and
+    question count. A question always travels with all of its texts.
+    """
+    batch: MicroBatch = []
+    batch_tokens = 0
+    for q in items:
+        texts = to_embed.get(q.get("question_id"), [])
+        tokens = sum(estimate_tokens(text) for text, _ in texts)
+        if batch and (
+            batch_tokens + tokens > INGEST_BATCH_TOKENS
+            or len(batch) >= INGEST_BATCH_MAX_ITEMS
+        ):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append((q, texts))
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def _embed_stage(
+    batches: Iterator[MicroBatch], handoff: queue.Queue, stop: threading.Event
+) -> None:
+    """Stage 1: embeds each micro-batch and hands it to the writer."""
+    try:
+        for batch in batches:
+            if stop.is_set():
+                break
+            pairs = [pair for _, texts in batch for pair in texts]
+            with metrics.timer("ingest.embed", items=len(pairs)):
+                if pairs:
+                    texts, targets = zip(*pairs)
+                    vectors = embed_documents_cached(list(texts))
+                    for target, vector in zip(targets, vectors):
+                        target["embedding"] = vector
+            handoff.put([q for q, _ in batch])
+    except Exception as e:
+        handoff.put(e)
+    finally:
+        handoff.put(None)
+
+
+def _write_stage(items: List[Dict]) -> None:
+    """Stage 2: writes one embedded micro-batch into Neo4j."""
+    with metrics.timer("ingest.write", items=len(items)):
+        if INGEST_WRITE_MODE == "bulk":
+            bulk_write(items)
+        else:
+            get_graph_instance().query(import_query, {"data": items})
+
+
+def run_pipeline(batches: Iterator[MicroBatch]) -> None:
+    """
+    Runs embedding and graph writes as concurrent stages joined by a bounded queue,
+    so Ollama embeds batch N+1 while Neo4j writes batch N.
+    """
+    handoff: queue.Queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    embedder = threading.Thread(
+        target=_embed_stage,
+        args=(batches, handoff, stop),
+        name="ingest-embedder",
+        daemon=True,
+    )
+    embedder.start()
+    try:
+        while (batch := handoff.get()) is not None:
+            if isinstance(batch, Exception):
+                raise batch
+            _write_stage(batch)
+    finally:
+        # Unblock the embedder if the writer stopped early on an error
+        stop.set()
+        while embedder.is_alive():
+            try:
+                handoff.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def process_ingestion(items: List[Dict]) -> Dict[str, int]:
+    """
+    Embeds and writes only new or changed questions and answers into Neo4j.
+    Returns created, updated and skipped counts.
+    """
+    graph = get_graph_instance()
+
+    # 1. Hash texts and render context documents
+    items = prepare_items(items)
+
+    # 2. Skip questions whose stored content hashes already match
+    classified = classify_items(items)
+    to_write = classified["created"] + classified["updated"]
+    embedded = sum(len(texts) for texts in classified["to_embed"].values())
+
+    if to_write:
+        # 3. Embed and insert into Neo4j as overlapping micro-batch stages
+        run_pipeline(micro_batches(to_write, classified["to_embed"]))
+
+        # 4. Refresh the bounded top-question lists of the touched tags and users
+        tag_names = {tag for q in to_write for tag in q.get("tags", [])}
+        user_ids = {
+            q["owner"]["user_id"]
+            for q in to_write
+            if (q.get("owner") or {}).get("user_id") is not None
+        }
+        user_ids.update(
+            (a.get("owner") or {}).get("user_id") or "deleted"
+            for q in to_write
+            for a in q.get("answers", [])
+        )
+        with metrics.timer("ingest.refresh_top_questions", items=len(to_write)):
+            graph.query(
+                top_questions_refresh_query,
+                {
+                    "tag_names": list(tag_names),
+                    "user_ids": list(user_ids),
+                    "question_ids": [q.get("question_id") for q in to_write],
+                    "fanout_cap": TOP_QUESTIONS_FANOUT_CAP,
+                },
+            )
+
+    summary = {
+        "count": len(to_write),
+        "created": len(classified["created"]),
+        "updated": len(classified["updated"]),
+        "skipped": len(classified["skipped"]),
+        "embedded": embedded,
+    }
+    metrics.incr("ingest.items_skipped", summary["skipped"])
+    logger.info(f"Ingestion summary: {summary}")
+    return summary
@@ -0,0 +1,217 @@
+"""Cypher queries used by the ingestion path"""
+
+# ===========================================================================================================================================================
+# Graph writes
+# ===========================================================================================================================================================
+import_query = """
+    UNWIND $data AS q
+    // Unchanged texts are not re-embedded, so stored vectors are kept when none is sent
+    MERGE (question:Question {id:q.question_id}) 
+    SET question.title = q.title, question.link = q.link, question.score = q.score,
+        question.favorite_count = q.favorite_count, question.creation_date = datetime({epochSeconds: q.creation_date}),
+        question.body = q.body_markdown, question.content_hash = q.content_hash,
+        question.embedding = coalesce(q.embedding, question.embedding)
+    // Materialized context document, only re-written when its rendered content changed
+    FOREACH (_ IN CASE WHEN coalesce(question.context_hash, '') <> q.context_hash THEN [1] ELSE [] END |
+        SET question.context = q.context, question.context_hash = q.context_hash
+    )
+    FOREACH (tagName IN q.tags | 
+        MERGE (tag:Tag {name:tagName}) 
+        MERGE (question)-[:TAGGED]->(tag)
+    )
+    FOREACH (a IN q.answers |
+        MERGE (question)<-[:ANSWERS]-(answer:Answer {id:a.answer_id})
+        SET answer.is_accepted = a.is_accepted,
+            answer.score = a.score,
+            answer.creation_date = datetime({epochSeconds:a.creation_date}),
+            answer.body = a.body_markdown,
+            answer.content_hash = a.content_hash,
+            answer.embedding = coalesce(a.embedding, answer.embedding)
+        MERGE (answerer:User {id:coalesce(a.owner.user_id, "deleted")}) 
+        ON CREATE SET answerer.display_name = a.owner.display_name,
+                      answerer.reputation= a.owner.reputation
+        MERGE (answer)<-[:PROVIDED]-(answerer)
+    )
+    WITH * WHERE NOT q.owner.user_id IS NULL
+    MERGE (owner:User {id:q.owner.user_id})
+    ON CREATE SET owner.display_name = q.owner.display_name,
+                  owner.reputation = q.owner.reputation
+    MERGE (owner)-[:ASKED]->(question)
+    """
+
+# Bounded fan-out: every Tag and User keeps a short list of its best Question ids, ranked by
+# score, accepted answers and recency. Only the previous list and the questions just ingested
+# are re-ranked, so the refresh cost does not grow with the corpus. Nodes without a list yet
+# are seeded once from their full neighbourhood.
+top_questions_refresh_query = """
+CALL {
+  UNWIND $tag_names AS tag_name
+  MATCH (tag:Tag {name: tag_name})
+  CALL {
+    WITH tag
+    WITH tag, CASE
+      WHEN tag.top_question_ids IS NULL THEN [(q:Question)-[:TAGGED]->(tag) | q.id]
+      ELSE tag.top_question_ids
+    END AS previous_ids
+    UNWIND previous_ids + $question_ids AS qid
+    MATCH (q:Question {id: qid})-[:TAGGED]->(tag)
+    WITH DISTINCT q
+    WITH q, EXISTS { (q)<-[:ANSWERS]-(:Answer {is_accepted: true}) } AS has_accepted
+    ORDER BY coalesce(q.score, 0) DESC, has_accepted DESC, q.creation_date DESC
+    LIMIT $fanout_cap
+    RETURN collect(q.id) AS top_ids
+  }
+  SET tag.top_question_ids = top_ids
+  RETURN count(tag) AS tags_refreshed
+}
+CALL {
+  UNWIND $user_ids AS user_id
+  MATCH (user:User {id: user_id})
+  CALL {
+    WITH user
+    WITH user, CASE
+      WHEN user.top_question_ids IS NULL
+        THEN [(user)-[:ASKED]->(q:Question) | q.id] + [(user)-[:PROVIDED]->(:Answer)-[:ANSWERS]->(q:Question) | q.id]
+      ELSE user.top_question_ids
+    END AS previous_ids
+    UNWIND previous_ids + $question_ids AS qid
+    MATCH (q:Question {id: qid})
+    WHERE EXISTS { (user)-[:ASKED]->(q) } OR EXISTS { (user)-[:PROVIDED]->(:Answer)-[:ANSWERS]->(q) }
+    WITH DISTINCT q
+    WITH q, EXISTS { (q)<-[:ANSWERS]-(:Answer {is_accepted: true}) } AS has_accepted
+    ORDER BY coalesce(q.score, 0) DESC, has_accepted DESC, q.creation_date DESC
+    LIMIT $fanout_cap
+    RETURN collect(q.id) AS top_ids
+  }
+  SET user.top_question_ids = top_ids
+  RETURN count(user) AS users_refreshed
+}
+RETURN tags_refreshed, users_refreshed
+"""
+
+# Maximum number of Questions a single Tag or User hit may expand to during retrieval
+TOP_QUESTIONS_FANOUT_CAP = 25
+
+
+# ===========================================================================================================================================================
+# Pre-checks
+# ===========================================================================================================================================================
+
+# Stored content hashes of the questions (and their answers) in an incoming batch
+known_items_query = """
+UNWIND $question_ids AS qid
+MATCH (question:Question {id: qid})
+RETURN
+  question.id AS question_id,
+  question.content_hash AS content_hash,
+  question.context_hash AS context_hash,
+  [(answer:Answer)-[:ANSWERS]->(question) | [answer.id, answer.content_hash]] AS answers
+"""
+
+
+# ===========================================================================================================================================================
+# Bulk import: hot nodes first, then questions/answers, then relationships
+# ===========================================================================================================================================================
+# Each step commits in batches of $batch_size rows, so a single large page never holds
+# locks on popular Tag / User nodes for the whole write.
+
+# Step 1: distinct hot nodes, merged once per batch
+bulk_merge_tags_query = """
+UNWIND $rows AS row
+CALL {
+  WITH row
+  MERGE (:Tag {name: row.name})
+} IN TRANSACTIONS OF $batch_size ROWS
+"""
+
+bulk_merge_users_query = """
+UNWIND $rows AS row
+CALL {
+  WITH row
+  MERGE (user:User {id: row.id})
+  ON CREATE SET user.display_name = row.display_name,
+                user.reputation = row.reputation
+} IN TRANSACTIONS OF $batch_size ROWS
+"""
+
+# Step 2: questions and their answers; only touches nodes owned by this batch
+bulk_merge_questions_query = """
+UNWIND $rows AS q
+CALL {
+  WITH q
+  MERGE (question:Question {id: q.question_id})
+  SET question.title = q.title, question.link = q.link, question.score = q.score,
+      question.favorite_count = q.favorite_count, question.creation_date = datetime({epochSeconds: q.creation_date}),
+      question.body = q.body_markdown, question.content_hash = q.content_hash,
+      question.embedding = coalesce(q.embedding, question.embedding)
+  FOREACH (_ IN CASE WHEN coalesce(question.context_hash, '') <> q.context_hash THEN [1] ELSE [] END |
+      SET question.context = q.context, question.context_hash = q.context_hash
+  )
+  FOREACH (a IN q.answers |
+      MERGE (question)<-[:ANSWERS]-(answer:Answer {id: a.answer_id})
+      SET answer.is_accepted = a.is_accepted,
+          answer.score = a.score,
+          answer.creation_date = datetime({epochSeconds: a.creation_date}),
+          answer.body = a.body_markdown,
+          answer.content_hash = a.content_hash,
+          answer.embedding = coalesce(a.embedding, answer.embedding)
+  )
+} IN TRANSACTIONS OF $batch_size ROWS
+"""
+
+# Step 3: relationships to hot nodes, rows sorted by hot-node key
+bulk_link_tagged_query = """
+UNWIND $rows AS row
+CALL {
+  WITH row
+  MATCH (question:Question {id: row.question_id})
+  MATCH (tag:Tag {name: row.tag})
+  MERGE (question)-[:TAGGED]->(tag)
+} IN TRANSACTIONS OF $batch_size ROWS
+"""
+
+bulk_link_asked_query = """
+UNWIND $rows AS row
+CALL {
+  WITH row
+  MATCH (owner:User {id: row.user_id})
+  MATCH (question:Question {id: row.question_id})
+  MERGE (owner)-[:ASKED]->(question)
+} IN TRANSACTIONS OF $batch_size ROWS
+"""
+
+bulk_link_provided_query = """
+UNWIND $rows AS row
+CALL {
+  WITH row
+  MATCH (answerer:User {id: row.user_id})
+  MATCH (answer:Answer {id: row.answer_id})
+  MERGE (answer)<-[:PROVIDED]-(answerer)
+} IN TRANSACTIONS OF $batch_size ROWS
+"""
+
+
+# ===========================================================================================================================================================
+# Embedding backfill
+# ===========================================================================================================================================================
+# Label and key property are filled in per store config. Texts are built like
+# Neo4jVector.from_existing_graph ("\nprop: value" per text property), so backfilled
+# vectors match those of the previous startup path.
+backfill_count_query = """
+MATCH (n:`{label}`) WHERE n.embedding IS NULL
+RETURN count(n) AS missing
+"""
+
+backfill_fetch_query = """
+MATCH (n:`{label}`)
+WHERE n.embedding IS NULL AND ($after IS NULL OR n.`{key}` > $after)
+WITH n ORDER BY n.`{key}` LIMIT $batch_size
+RETURN elementId(n) AS element_id, n.`{key}` AS key,
+       reduce(text = '', prop IN $properties | text + '\\n' + prop + ': ' + coalesce(toString(n[prop]), '')) AS text
+"""
+
+backfill_write_query = """
+UNWIND $rows AS row
+MATCH (n) WHERE elementId(n) = row.element_id
+CALL db.create.setNodeVectorProperty(n, 'embedding', row.embedding)
+"""
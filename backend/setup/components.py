@@ -0,0 +1,117 @@
+"""Lazy registry of heavy components (search indexes, reranker, agent) with a startup-time report"""
+
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# Build all components in a background thread at startup instead of on first use
+COMPONENT_WARMUP = (os.getenv("COMPONENT_WARMUP") or "on").lower() != "off"
+
+
+class ComponentRegistry:
+    """
+    Builds registered components once, on first use or from a background warmup.
+
+    A component is registered as "module:function". The module import and the factory
+    call are timed separately, so the startup report shows what each component costs.
+    Concurrent callers of `get` wait for the same build; a failed build is recorded
+    and retried on the next call.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, str] = {}
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._report: Dict[str, Dict[str, Any]] = {}
+        self._warmup: Optional[threading.Thread] = None
+        # The registry is created on the app's first project import; see `since_created`
+        self.created_at = time.perf_counter()
+
+    def register(self, name: str, factory: str) -> None:
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+        self._report[name] = {"status": "pending"}
+
+    def record(self, name: str, seconds: float) -> None:
+        """Records the cost of an eagerly loaded part of the app, e.g. module imports."""
+        self._report[name] = {"status": "ready", "import_seconds": round(seconds, 3)}
+
+    def since_created(self) -> float:
+        return time.perf_counter() - self.created_at
+
+    def is_ready(self, name: str) -> bool:
+        return name in self._instances
+
+    def get(self, name: str) -> Any:
+        if name in self._instances:
+            return self._instances[name]
+
+        with self._locks[name]:
+            if name in self._instances:
+                return self._instances[name]
+
+            module_name, function_name = self._factories[name].split(":")
+            self._report[name] = {"status": "loading"}
+            try:
+                start = time.perf_counter()
+                factory: Callable[[], Any] = getattr(
+                    importlib.import_module(module_name), function_name
+                )
+                imported = time.perf_counter()
+                instance = factory()
+                built = time.perf_counter()
+            except Exception as e:
+                self._report[name] = {"status": "failed", "error": str(e)}
+                logger.error(f"Failed to initialize component {name}: {e}")
+                raise
+
+            self._report[name] = {
+                "status": "ready",
+                "import_seconds": round(imported - start, 3),
+                "init_seconds": round(built - imported, 3),
+            }
+            self._instances[name] = instance
+            logger.info(f"Component {name} ready: {self._report[name]}")
+            return instance
+
+    def warmup(self, names: Optional[Iterable[str]] = None) -> None:
+        """Builds components in a daemon thread so the API answers in the meantime."""
+        if self._warmup and self._warmup.is_alive():
+            return
+        names = list(names or self._factories)
+
+        def run() -> None:
+            start = time.perf_counter()
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    pass  # Already logged; the next caller retries
+            logger.info(
+                f"Component warmup finished in {time.perf_counter() - start:.2f}s: "
+                f"{self.report()}"
+            )
+
+        self._warmup = threading.Thread(
+            target=run, name="component-warmup", daemon=True
+        )
+        self._warmup.start()
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        return {name: dict(entry) for name, entry in self._report.items()}
+
+
+components = ComponentRegistry()
+
+# Warmup order: dependencies first, the agent (which uses both) last
+components.register("search_indexes", "tools.graph_rag_tool:load_search_indexes")
+components.register("reranker", "tools.graph_rag_tool:load_compressor")
+components.register("agent", "agent.agent:build_agent")
@@ -1,12 +1,16 @@
 """Setting up ollama models, vectorstores and Neo4j Configs"""
 
 import os
+import threading
+
+import httpx
 from dotenv import load_dotenv
 from langchain_ollama import OllamaEmbeddings, ChatOllama
 from langchain_neo4j import Neo4jGraph, Neo4jVector
 from langchain_neo4j.vectorstores.neo4j_vector import SearchType
-from typing import Dict
-from langchain_community.cross_encoders import HuggingFaceCrossEncoder
+from typing import Callable, Dict, List
+
+from utils.metrics import metrics
 
 # ===========================================================================================================================================================
 # Step 1: Load Configuration: Docker, Neo4j, Ollama, Langchain
@@ -19,47 +23,155 @@ NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL")
 
 
+ANSWER_LLM_MODEL = "qwen3:8b"
+EMBEDDING_MODEL_NAME = "jina/jina-embeddings-v2-base-en:latest"
+SUMMARIZER_MODEL = "qwen3:0.6b"
+
+# How long Ollama keeps each model loaded after a request, e.g. "30m", "2h", "-1" (forever)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE") or "30m"
+# Keep-alive HTTP connections per model client
+OLLAMA_POOL_CONNECTIONS = int(os.getenv("OLLAMA_POOL_CONNECTIONS") or 10)
+
+
+def _keep_alive_seconds(env_name: str) -> int:
+    """Per-model keep_alive from `env_name`, falling back to OLLAMA_KEEP_ALIVE."""
+    value = (os.getenv(env_name) or OLLAMA_KEEP_ALIVE).strip()
+    units = {"s": 1, "m": 60, "h": 3600}
+    if value[-1:] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def _ollama_client_kwargs() -> Dict:
+    """httpx options for the Ollama client: a bounded pool of keep-alive connections."""
+    return {
+        "limits": httpx.Limits(
+            max_connections=OLLAMA_POOL_CONNECTIONS,
+            max_keepalive_connections=OLLAMA_POOL_CONNECTIONS,
+            keepalive_expiry=300,
+        ),
+        "timeout": httpx.Timeout(None, connect=10.0),
+    }
+
+
+# ===========================================================================================================================================================
+# Model client registry: one client (and HTTP connection pool) per model, per process
+# ===========================================================================================================================================================
+_model_clients: Dict[str, object] = {}
+_model_clients_lock = threading.Lock()
+
+
+def _get_model_client(name: str, factory: Callable[[], object]):
+    """Returns the process-wide client `name`, creating it on first use."""
+    metrics.incr(f"model_client.{name}.lookups")
+    client = _model_clients.get(name)
+    if client is None:
+        with _model_clients_lock:
+            client = _model_clients.get(name)
+            if client is None:
+                client = _model_clients[name] = factory()
+    return client
+
+
+def _pool_stats(http_client) -> Dict[str, int]:
+    # httpx keeps its pool on the transport; this is best-effort introspection
+    try:
+        connections = http_client._transport._pool.connections
+    except AttributeError:
+        return {}
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {
+        "connections": len(connections),
+        "idle": idle,
+        "active": len(connections) - idle,
+    }
+
+
+def model_client_stats() -> Dict[str, Dict]:
+    """
+    Per model client: registry lookups and HTTP pool usage of the sync client (invoke,
+    embeddings) and of the async client (astream, e.g. the streamed answer).
+    """
+    counters = metrics.snapshot()["counters"]
+    stats = {}
+    for name, client in list(_model_clients.items()):
+        stats[name] = {
+            "model": getattr(client, "model_name", None)
+            or getattr(client, "model", None),
+            "lookups": int(counters.get(f"model_client.{name}.lookups", 0)),
+            "keep_alive": getattr(client, "keep_alive", None),
+            "pool": {
+                kind: _pool_stats(
+                    getattr(getattr(client, attribute, None), "_client", None)
+                )
+                for kind, attribute in (("sync", "_client"), ("async", "_async_client"))
+            },
+        }
+    return stats
+
+
 # qwen3:8b works for now with limited context of 40k, qwen3:30b works with 256k max
 def answer_LLM():
-    return ChatOllama(
-        model="qwen3:8b",
-        base_url=OLLAMA_BASE_URL,
-        num_ctx=40960,  # 40k context
-        num_predict=8192,  # max tokens in answer
-        temperature=0.7,  # more creative
-        repeat_penalty=1.5,  # higher, penalise repetitions
-        repeat_last_n=-1,  # look back within context to penalise penalty
-        top_p=0.5,  # more focused text
-        top_k=10,  # give less diverse answers
-        num_thread=8,
-        reasoning=True,
+    return _get_model_client(
+        "answer_llm",
+        lambda: ChatOllama(
+            model=ANSWER_LLM_MODEL,
+            base_url=OLLAMA_BASE_URL,
+            num_ctx=40960,  # 40k context
+            num_predict=8192,  # max tokens in answer
+            temperature=0.7,  # more creative
+            repeat_penalty=1.5,  # higher, penalise repetitions
+            repeat_last_n=-1,  # look back within context to penalise penalty
+            top_p=0.5,  # more focused text
+            top_k=10,  # give less diverse answers
+            num_thread=8,
+            reasoning=True,
+            keep_alive=_keep_alive_seconds("ANSWER_LLM_KEEP_ALIVE"),
+            client_kwargs=_ollama_client_kwargs(),
+        ),
     )
 
 
 # embedding model
 def embedding_model():
-    return OllamaEmbeddings(
-        model="jina/jina-embeddings-v2-base-en:latest",
-        base_url=OLLAMA_BASE_URL,
-        num_ctx=8192,  # 8k context
-        num_thread=16,
+    return _get_model_client(
+        "embedding",
+        lambda: OllamaEmbeddings(
+            model=EMBEDDING_MODEL_NAME,
+            base_url=OLLAMA_BASE_URL,
+            num_ctx=8192,  # 8k context
+            num_thread=16,
+            keep_alive=_keep_alive_seconds("EMBEDDING_KEEP_ALIVE"),
+            client_kwargs=_ollama_client_kwargs(),
+        ),
     )
 
 
 # reranker model
 def reranker_model():
-    return HuggingFaceCrossEncoder(
-        model_name="BAAI/bge-reranker-base",
-        model_kwargs={"device": "cuda"},  # Use 'cuda' for GPU acceleration
+    # Imported here: langchain_community is slow to import and only the reranker needs it
+    from langchain_community.cross_encoders import HuggingFaceCrossEncoder
+
+    return _get_model_client(
+        "reranker",
+        lambda: HuggingFaceCrossEncoder(
+            model_name="BAAI/bge-reranker-base",
+            model_kwargs={"device": "cuda"},  # Use 'cuda' for GPU acceleration
+        ),
     )
 
 
 # save llama3.1:8b for now
 def summarizer():
-    return ChatOllama(
-        model="qwen3:0.6b",
-        base_url=OLLAMA_BASE_URL,
-        num_ctx=40960,  # 40k context
+    return _get_model_client(
+        "summarizer",
+        lambda: ChatOllama(
+            model=SUMMARIZER_MODEL,
+            base_url=OLLAMA_BASE_URL,
+            num_ctx=40960,  # 40k context
+            keep_alive=_keep_alive_seconds("SUMMARIZER_KEEP_ALIVE"),
+            client_kwargs=_ollama_client_kwargs(),
+        ),
     )
 
 
@@ -88,57 +200,61 @@ def get_graph_instance() -> Neo4jGraph:
 # ===========================================================================================================================================================
 
 
-def create_vector_stores(graph, EMBEDDINGS, retrieval_query) -> Dict[str, Neo4jVector]:
+# Vector and keyword indexes per node label; shared with the offline bulk-load indexes
+VECTOR_STORE_CONFIGS = [
+    {
+        "node_label": "Tag",
+        "text_node_properties": ["name"],
+    },
+    {
+        "node_label": "User",
+        "text_node_properties": ["reputation", "display_name"],
+    },
+    {
+        "node_label": "Question",
+        "text_node_properties": [
+            "score",
+            "link",
+            "favourite_count",
+            "id",
+            "creation_date",
+            "body",
+            "title",
+        ],
+    },
+    {
+        "node_label": "Answer",
+        "text_node_properties": [
+            "score",
+            "is_accepted",
+            "id",
+            "body",
+            "creation_date",
+        ],
+    },
+]
+
+
+def create_vector_stores(
+    graph, EMBEDDINGS, retrieval_query: str = ""
+) -> Dict[str, Neo4jVector]:
     """
     Creates Neo4jVector stores from an existing graph using a data-driven approach.
 
     Args:
         graph: The Neo4j graph instance.
         EMBEDDINGS: The embedding model.
-        retrieval_query: The Cypher query for retrieval.
+        retrieval_query: Optional per-store Cypher retrieval query. Retrieval itself runs
+            through the single-round-trip hybrid search, so this is usually empty.
 
     Returns:
         A dictionary of Neo4jVector store instances, keyed by their node label.
     """
 
-    # Define a list of configurations for each vector store
-    store_configs = [
-        {
-            "node_label": "Tag",
-            "text_node_properties": ["name"],
-        },
-        {
-            "node_label": "User",
-            "text_node_properties": ["reputation", "display_name"],
-        },
-        {
-            "node_label": "Question",
-            "text_node_properties": [
-                "score",
-                "link",
-                "favourite_count",
-                "id",
-                "creation_date",
-                "body",
-                "title",
-            ],
-        },
-        {
-            "node_label": "Answer",
-            "text_node_properties": [
-                "score",
-                "is_accepted",
-                "id",
-                "body",
-                "creation_date",
-            ],
-        },
-    ]
-
     vectorstores = {}
 
     # Loop through the configurations and create the vectorstores & vector indexes
-    for config in store_configs:
+    for config in VECTOR_STORE_CONFIGS:
         label = config["node_label"]
         index_name = f"{label}_index"
         keyword_index_name = f"{label}_keyword_index"
@@ -157,3 +273,111 @@ def create_vector_stores(graph, EMBEDDINGS, retrieval_query) -> Dict[str, Neo4jV
         print(f"Created vectorstore for {index_name} index")
 
     return vectorstores
+
+
+def create_lookup_indexes(graph) -> None:
+    """
+    Creates the property indexes used for id lookups during ingestion and for the
+    bounded Tag / User fan-out in retrieval. Failures are logged, not raised, since an
+    equivalent constraint may already own the index.
+    """
+    lookup_indexes = {
+        "question_id_index": "FOR (n:Question) ON (n.id)",
+        "answer_id_index": "FOR (n:Answer) ON (n.id)",
+        "tag_name_index": "FOR (n:Tag) ON (n.name)",
+        "user_id_index": "FOR (n:User) ON (n.id)",
+    }
+
+    for index_name, definition in lookup_indexes.items():
+        try:
+            graph.query(f"CREATE INDEX {index_name} IF NOT EXISTS {definition}")
+        except Exception as e:
+            print(f"Skipped lookup index {index_name}: {e}")
+
+
+def create_search_indexes(graph, dimensions: int) -> None:
+    """
+    Creates the vector and fulltext indexes that `create_vector_stores` attaches to,
+    with the same names, labels and properties. Used after an offline bulk load, where
+    nodes already carry their embeddings.
+    """
+    for config in VECTOR_STORE_CONFIGS:
+        label = config["node_label"]
+        properties = ", ".join(f"n.`{prop}`" for prop in config["text_node_properties"])
+        graph.query(
+            f"CREATE VECTOR INDEX {label}_index IF NOT EXISTS "
+            f"FOR (n:`{label}`) ON n.`embedding` "
+            "OPTIONS {indexConfig: {`vector.dimensions`: toInteger($dimensions), "
+            "`vector.similarity_function`: 'cosine'}}",
+            {"dimensions": dimensions},
+        )
+        graph.query(
+            f"CREATE FULLTEXT INDEX {label}_keyword_index IF NOT EXISTS "
+            f"FOR (n:`{label}`) ON EACH [{properties}]"
+        )
+        print(f"Created search indexes for {label}")
+
+
+_embedding_dimensions = None
+
+
+def embedding_dimensions() -> int:
+    """Dimensions of the embedding model: EMBEDDING_DIMENSIONS, else one probe call."""
+    global _embedding_dimensions
+    if _embedding_dimensions is None:
+        configured = os.getenv("EMBEDDING_DIMENSIONS")
+        _embedding_dimensions = (
+            int(configured)
+            if configured
+            else len(embedding_model().embed_query("dimension probe"))
+        )
+    return _embedding_dimensions
+
+
+def attach_search_indexes(graph, dimensions: int) -> List[Dict[str, str]]:
+    """
+    Attaches to the existing vector and fulltext indexes without touching node data.
+
+    Reads SHOW INDEXES once, creates any missing index pair and verifies that every
+    vector index matches the embedding model's dimensions. Nodes without embeddings
+    are left to the background backfill. Returns the index pairs used by hybrid search.
+    """
+    rows = graph.query(
+        """
+        SHOW INDEXES YIELD name, type, state, options
+        WHERE type IN ['VECTOR', 'FULLTEXT']
+        RETURN name, type, state, options.indexConfig.`vector.dimensions` AS dimensions
+        """
+    )
+    existing = {row["name"]: row for row in rows}
+
+    expected = [
+        (f"{config['node_label']}_index", f"{config['node_label']}_keyword_index")
+        for config in VECTOR_STORE_CONFIGS
+    ]
+    if any(name not in existing for pair in expected for name in pair):
+        print("Some search indexes are missing, creating them")
+        create_search_indexes(graph, dimensions)
+        existing.update(
+            {
+                name: {"dimensions": dimensions, "state": "POPULATING"}
+                for pair in expected
+                for name in pair
+                if name not in existing
+            }
+        )
+
+    for vector_index, _ in expected:
+        found = existing[vector_index]["dimensions"]
+        if found is not None and int(found) != dimensions:
+            raise ValueError(
+                f"Vector index {vector_index} has {found} dimensions, "
+                f"but the embedding model produces {dimensions}"
+            )
+        if existing[vector_index]["state"] != "ONLINE":
+            print(f"Vector index {vector_index} is {existing[vector_index]['state']}")
+
+    return [
+        {"vector_index": vector_index, "keyword_index": keyword_index}
+        for vector_index, keyword_index in expected
+    ]
@@ -0,0 +1,170 @@
+"""Readiness: model warmup with synthetic queries and cached background dependency probes"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from setup.components import components
+from setup.init_config import (
+    OLLAMA_BASE_URL,
+    answer_LLM,
+    embedding_model,
+    get_graph_instance,
+)
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+READINESS_PROBE_INTERVAL = float(os.getenv("READINESS_PROBE_INTERVAL") or 30)
+WARMUP_QUESTION = "How do I merge two dictionaries in Python?"
+
+
+# ===========================================================================================================================================================
+# Warmup steps and probes
+# ===========================================================================================================================================================
+def _warm_llm() -> None:
+    # A one-token completion is enough to make Ollama load the model weights. The copy
+    # keeps the serving options (e.g. num_ctx), otherwise Ollama reloads the model on the
+    # first question.
+    answer_LLM().model_copy(update={"num_predict": 1}).invoke("ping")
+
+
+def _warm_embedder() -> None:
+    embedding_model().embed_query(WARMUP_QUESTION)
+
+
+def _warm_reranker() -> None:
+    components.get("reranker").model.score([(WARMUP_QUESTION, WARMUP_QUESTION)])
+
+
+def _warm_indexes() -> None:
+    # Imported here: the tool module pulls in the retrieval chain. The ranking query is
+    # run without retrieve_raw_docs' fallback so a failure marks the step not ready.
+    from tools.graph_rag_tool import query_raw_docs
+
+    query_raw_docs(WARMUP_QUESTION)
+
+
+WARMUP_STEPS: Dict[str, Callable[[], None]] = {
+    "embedder": _warm_embedder,
+    "search_indexes": _warm_indexes,
+    "reranker": _warm_reranker,
+    "llm": _warm_llm,
+}
+
+
+def _probe_neo4j() -> None:
+    get_graph_instance().query("RETURN 1")
+
+
+def _probe_ollama() -> None:
+    httpx.get(f"{OLLAMA_BASE_URL}/api/version", timeout=5).raise_for_status()
+
+
+def _probe_embedder() -> None:
+    embedding_model().embed_query("readiness probe")
+
+
+PROBES: Dict[str, Callable[[], None]] = {
+    "neo4j": _probe_neo4j,
+    "ollama": _probe_ollama,
+    "embedder": _probe_embedder,
+}
+
+
+class Readiness:
+    """
+    Runs the warmup once at startup, then refreshes dependency probes in a daemon
+    thread. `/ready` only reads the cached state, so it never waits on a dependency.
+    """
+
+    def __init__(self, probe_interval: float = READINESS_PROBE_INTERVAL):
+        self.probe_interval = probe_interval
+        self.warmup_status = "pending"
+        self.warmup: Dict[str, Dict] = {}
+        self.probes: Dict[str, Dict] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self, warmup: bool = True) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(warmup,), name="readiness", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    @property
+    def ready(self) -> bool:
+        return self.warmup_status in ("completed", "skipped") and all(
+            probe["ok"] for probe in self.probes.values()
+        )
+
+    def snapshot(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "warmup_status": self.warmup_status,
+            "warmup": self.warmup,
+            "probes": self.probes,
+            "components": components.report(),
+        }
+
+    def _run(self, warmup: bool) -> None:
+        # Probe first so /ready reports dependency state while the warmup runs
+        self._refresh_probes()
+        if warmup:
+            self._warmup()
+        else:
+            self.warmup_status = "skipped"
+        while not self._stop.wait(self.probe_interval):
+            self._refresh_probes()
+            if self.warmup_status == "failed":
+                self._warmup()
+
+    def _warmup(self) -> None:
+        self.warmup_status = "running"
+        start = time.perf_counter()
+        for name in ("search_indexes", "reranker", "agent"):
+            try:
+                components.get(name)
+            except Exception:
+                pass  # Reported by the registry; the failed step below shows it too
+
+        failed = False
+        for name, step in WARMUP_STEPS.items():
+            self.warmup[name] = self._timed(step)
+            failed |= not self.warmup[name]["ok"]
+        self.warmup_status = "failed" if failed else "completed"
+        logger.info(
+            f"Warmup {self.warmup_status} in {time.perf_counter() - start:.2f}s: "
+            f"{self.warmup}"
+        )
+
+    def _refresh_probes(self) -> None:
+        for name, probe in PROBES.items():
+            self.probes[name] = self._timed(probe)
+
+    @staticmethod
+    def _timed(step: Callable[[], None]) -> Dict:
+        start = time.perf_counter()
+        try:
+            step()
+            result = {"ok": True}
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        result["checked_at"] = time.time()
+        return result
+
+
+# Process-wide readiness state, started with the FastAPI app
+readiness = Readiness()
@@ -0,0 +1,92 @@
+"""Parses the bundled sample dump into StackExchange API items, without Neo4j or Ollama."""
+
+import os
+
+import pytest
+
+from ingest.dump_import import DumpIndex, iter_questions
+
+SAMPLE_DUMP_DIR = os.path.join(
+    os.path.dirname(__file__), os.pardir, "setup", "data", "sample_dump"
+)
+POSTS_PATH = os.path.join(SAMPLE_DUMP_DIR, "Posts.xml")
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = DumpIndex(str(tmp_path / "index.sqlite3"))
+    index.index_users(os.path.join(SAMPLE_DUMP_DIR, "Users.xml"))
+    index.index_answers(POSTS_PATH)
+    return index
+
+
+@pytest.fixture
+def questions(index):
+    items = iter_questions(POSTS_PATH, index, "https://stackoverflow.com")
+    return {item["question_id"]: item for item in items}
+
+
+def test_only_answered_questions_are_yielded(questions):
+    # 1009 has no answers
+    assert sorted(questions) == [1001, 1004, 1007]
+
+
+def test_tags_in_both_dump_formats(questions):
+    assert questions[1001]["tags"] == ["neo4j", "cypher"]
+    assert questions[1004]["tags"] == ["python", "list"]
+    assert questions[1007]["tags"] == ["python", "neo4j", "cypher"]
+
+
+def test_owners_are_joined_from_users(questions):
+    assert questions[1001]["owner"] == {
+        "user_id": 102,
+        "display_name": "cypher_fan",
+        "reputation": 3410,
+    }
+    assert questions[1004]["owner"]["user_id"] == 103
+    assert questions[1007]["owner"]["user_id"] == 104
+
+
+def test_answers_with_accepted_flag_and_owner(questions):
+    answers = {
+        question_id: [
+            (a["answer_id"], a["is_accepted"], a["owner"].get("user_id"))
+            for a in item["answers"]
+        ]
+        for question_id, item in questions.items()
+    }
+    assert answers == {
+        1001: [(1002, False, 103), (1003, True, 101)],
+        # 1006's owner was deleted: no user_id, as in the API
+        1004: [(1005, True, 104), (1006, False, None)],
+        1007: [(1008, False, 102)],
+    }
+    assert questions[1004]["answers"][1]["owner"] == {"display_name": "removed_user"}
+
+
+def test_bodies_are_converted_from_html(questions):
+    body = questions[1001]["body_markdown"]
+    assert body.startswith("How do I create a relationship")
+    assert "```\nMATCH (a:Person), (b:Person) RETURN a, b\n```" in body
+    for item in questions.values():
+        assert "<" not in item["body_markdown"]
+        assert "&lt;" not in item["body_markdown"]
+        for answer in item["answers"]:
+            assert "&gt;" not in answer["body_markdown"]
+
+
+def test_links_and_dates(questions):
+    question = questions[1001]
+    assert question["link"] == "https://stackoverflow.com/questions/1001"
+    assert question["creation_date"] == 1584178013  # 2020-03-14T09:26:53Z
+    assert question["score"] == 42
+
+
+def test_resume_after_checkpoint_and_tag_filter(index):
+    resumed = iter_questions(POSTS_PATH, index, "https://stackoverflow.com", 1001)
+    assert [item["question_id"] for item in resumed] == [1004, 1007]
+
+    tagged = iter_questions(
+        POSTS_PATH, index, "https://stackoverflow.com", tags={"neo4j"}
+    )
+    assert [item["question_id"] for item in tagged] == [1001, 1007]
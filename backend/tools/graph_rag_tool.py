@@ -2,20 +2,20 @@ from setup.init_config import (
     get_graph_instance,
     embedding_model,
     create_vector_stores,
+    create_lookup_indexes,
+    attach_search_indexes,
+    embedding_dimensions,
     reranker_model,
     answer_LLM,
 )
-from langchain_classic.retrievers.ensemble import EnsembleRetriever
-from langchain_classic.retrievers.document_compressors.cross_encoder_rerank import (
-    CrossEncoderReranker,
-)
-from langchain_core.runnables import RunnablePassthrough, RunnableLambda
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda, RunnableConfig
 from typing import List, Dict, Optional, Type, Any
 from langchain_core.documents import Document
 from prompts.system_prompts import analyst_prompt
 from utils.util import format_docs_with_metadata, escape_lucene_chars
 from langchain_core.tools import BaseTool
 from agent.messages import format_chat_history
+from agent.streaming import emit_stage, stage_signal
 from middleware.langchain_middleware import (
     process_with_topic_analysis,
 )
@@ -24,7 +24,12 @@ from langchain_core.callbacks import (
     AsyncCallbackManagerForToolRun,
 )
 from pydantic import BaseModel, Field
+from ingest.queries import TOP_QUESTIONS_FANOUT_CAP
+from setup.components import components
+from utils.query_embedding import embed_query_cached
+from tools.speculative_retrieval import claim_speculative_docs
 import logging
+import os
 
 
 logger = logging.getLogger(__name__)
@@ -32,225 +37,260 @@ logger = logging.getLogger(__name__)
 # ===========================================================================================================================================================
 # Crafting custom cypher retrieval queries
 # ===========================================================================================================================================================
-import_query = """
-    UNWIND $data AS q
-    MERGE (question:Question {id:q.question_id}) 
-    ON CREATE SET question.title = q.title, question.link = q.link, question.score = q.score,
-        question.favorite_count = q.favorite_count, question.creation_date = datetime({epochSeconds: q.creation_date}),
-        question.body = q.body_markdown, question.embedding = q.embedding
-    FOREACH (tagName IN q.tags | 
-        MERGE (tag:Tag {name:tagName}) 
-        MERGE (question)-[:TAGGED]->(tag)
-    )
-    FOREACH (a IN q.answers |
-        MERGE (question)<-[:ANSWERS]-(answer:Answer {id:a.answer_id})
-        SET answer.is_accepted = a.is_accepted,
-            answer.score = a.score,
-            answer.creation_date = datetime({epochSeconds:a.creation_date}),
-            answer.body = a.body_markdown,
-            answer.embedding = a.embedding
-        MERGE (answerer:User {id:coalesce(a.owner.user_id, "deleted")}) 
-        ON CREATE SET answerer.display_name = a.owner.display_name,
-                      answerer.reputation= a.owner.reputation
-        MERGE (answer)<-[:PROVIDED]-(answerer)
-    )
-    WITH * WHERE NOT q.owner.user_id IS NULL
-    MERGE (owner:User {id:q.owner.user_id})
-    ON CREATE SET owner.display_name = q.owner.display_name,
-                  owner.reputation = q.owner.reputation
-    MERGE (owner)-[:ASKED]->(question)
-    """
+# Single-round-trip hybrid search: queries every vector index and its keyword index,
+# applies the score threshold in the database and fuses hits with reciprocal-rank fusion
+hybrid_search_query = """
+UNWIND $indexes AS idx
+CALL {
+  WITH idx
+  CALL db.index.vector.queryNodes(idx.vector_index, $k, $embedding)
+  YIELD node, score
+  RETURN node, score
+  UNION
+  // Keyword scores are normalised against the best hit of each index
+  WITH idx
+  CALL db.index.fulltext.queryNodes(idx.keyword_index, $keyword_query, {limit: $k})
+  YIELD node, score
+  WITH collect({node: node, score: score}) AS hits, max(score) AS max_score
+  UNWIND hits AS hit
+  RETURN hit.node AS node, hit.score / max_score AS score
+}
+// Keep the best hybrid score per node and filter inside the database
+WITH idx, node, max(score) AS score
+WHERE score >= $score_threshold
+
+// Rank hits within each index for reciprocal-rank fusion
+WITH idx, node, score ORDER BY score DESC
+WITH idx, collect({node: node, score: score}) AS ranked
+UNWIND range(0, size(ranked) - 1) AS rank
+WITH ranked[rank].node AS node, ranked[rank].score AS score, rank
 
-retrieval_query = """
-// Start from vector search result variables: `node`, `score`
-WITH node, score
 // Route any node type to related Question(s) via UNION branches to avoid implicit grouping
 CALL {
-  WITH node
   // If node is a Question, use it directly
   WITH node
-  MATCH (q:Question)
-  WHERE node:Question AND elementId(q) = elementId(node)
-  RETURN q
+  WITH node WHERE node:Question
+  RETURN node AS q
   UNION
   // If node is an Answer, route to its Question
   WITH node
   MATCH (node:Answer)-[:ANSWERS]->(q:Question)
   RETURN q
   UNION
-  // If node is a Tag, route to Questions tagged with it
+  // If node is a Tag or User, route to its precomputed top Questions (bounded fan-out)
+  WITH node
+  WITH node WHERE (node:Tag OR node:User) AND node.top_question_ids IS NOT NULL
+  UNWIND node.top_question_ids[..$fanout_cap] AS qid
+  MATCH (q:Question {id: qid})
+  RETURN q
+  UNION
+  // Tags not yet ranked by an ingest fall back to a capped expansion
   WITH node
   MATCH (q:Question)-[:TAGGED]->(node:Tag)
+  WHERE node.top_question_ids IS NULL
+  WITH q LIMIT $fanout_cap
   RETURN q
   UNION
-  // If node is a User, include Questions they asked
+  // Users not yet ranked by an ingest: Questions they asked, capped
   WITH node
   MATCH (node:User)-[:ASKED]->(q:Question)
+  WHERE node.top_question_ids IS NULL
+  WITH q LIMIT $fanout_cap
   RETURN q
   UNION
-  // If node is a User, include Questions they answered
+  // Users not yet ranked by an ingest: Questions they answered, capped
   WITH node
   MATCH (node:User)-[:PROVIDED]->(:Answer)-[:ANSWERS]->(q:Question)
+  WHERE node.top_question_ids IS NULL
+  WITH q LIMIT $fanout_cap
   RETURN q
 }
-WITH DISTINCT q AS question, node, score
-
-// Community detection: compute overlap and optionally filter to same community when available
-WITH
-  question,
-  node,
-  score,
-  any(x IN coalesce(question.CommunityId, []) WHERE x IN coalesce(node.CommunityId, [])) AS sameCommunity,
-  (size(coalesce(question.CommunityId, [])) > 0 AND size(coalesce(node.CommunityId, [])) > 0) AS bothHaveCommunity
-WHERE NOT bothHaveCommunity OR sameCommunity
-
-// Build rich context for each question
-// Core question data
-WITH DISTINCT question, score, sameCommunity,
-     coalesce(question.CommunityId, []) AS qComm,
-     coalesce(node.CommunityId, []) AS nComm,
-     {
-  id: question.id,
-  title: question.title,
-  body: question.body,
-  link: question.link,
-  score: question.score,
-  favorite_count: question.favorite_count,
-  creation_date: toString(question.creation_date)
-} AS questionDetails
-
-// Askers
-OPTIONAL MATCH (asker:User)-[:ASKED]->(question)
-WITH question, score, sameCommunity, qComm, nComm, questionDetails, {
-  id: asker.id,
-  display_name: asker.display_name,
-  reputation: asker.reputation
-} AS askerDetails
-
-// Tags
-OPTIONAL MATCH (question)-[:TAGGED]->(tag:Tag)
-WITH question, score, sameCommunity, qComm, nComm, questionDetails, askerDetails,
-     COLLECT(DISTINCT tag.name) AS tags
-
-// Answers + providers
-OPTIONAL MATCH (answer:Answer)-[:ANSWERS]->(question)
-OPTIONAL MATCH (provider:User)-[:PROVIDED]->(answer)
-WITH question, score, sameCommunity, qComm, nComm, questionDetails, askerDetails, tags,
-     COLLECT(DISTINCT {
-       id: answer.id,
-       body: answer.body,
-       score: answer.score,
-       is_accepted: answer.is_accepted,
-       creation_date: toString(answer.creation_date),
-       provided_by: {
-         id: provider.id,
-         display_name: provider.display_name,
-         reputation: provider.reputation
-       }
-     }) AS answers
-
-// Final projection
+WITH q AS question, node, score, rank
+
+// Community detection: drop routes between nodes of different communities when both are known
+WHERE NOT (size(coalesce(question.CommunityId, [])) > 0 AND size(coalesce(node.CommunityId, [])) > 0)
+   OR any(x IN coalesce(question.CommunityId, []) WHERE x IN coalesce(node.CommunityId, []))
+
+// Fuse ranks across indexes, keeping the best raw similarity for observability
+WITH question, sum(1.0 / ($rrf_k + rank + 1)) AS rrf_score, max(score) AS simscore
+ORDER BY rrf_score DESC
+LIMIT $top_k
+"""
+
+# Phase 1: ranked ids plus a short rerank text (title + truncated body), no hydration
+ranking_query = (
+    hybrid_search_query
+    + """
 RETURN
-  'Title: ' + coalesce(question.title, '') + '\\nBody: ' + coalesce(question.body, '') AS text,
-  {
-    question_details: questionDetails,
-    asked_by: askerDetails,
-    tags: tags,
+  question.id AS question_id,
+  'Title: ' + coalesce(question.title, '') + '\\nBody: ' + left(coalesce(question.body, ''), $rerank_body_chars) AS text,
+  rrf_score,
+  simscore
+ORDER BY rrf_score DESC
+"""
+)
+
+# Build rich context for each ranked question. Questions ingested with a materialized
+# context document are returned as a single pre-rendered string; older questions fall back
+# to projecting asker, tags and answers from the graph.
+question_context_projection = """
+RETURN
+  coalesce(
+    question.context,
+    'Title: ' + coalesce(question.title, '') + '\\nBody: ' + coalesce(question.body, '')
+  ) AS text,
+  CASE WHEN question.context IS NOT NULL THEN {
+    question_details: {
+      id: question.id,
+      link: question.link
+    },
+    simscore: simscore,
+    rrf_score: rrf_score
+  } ELSE {
+    question_details: {
+      id: question.id,
+      title: question.title,
+      body: question.body,
+      link: question.link,
+      score: question.score,
+      favorite_count: question.favorite_count,
+      creation_date: toString(question.creation_date)
+    },
+    asked_by: head([(asker:User)-[:ASKED]->(question) | {
+      id: asker.id,
+      display_name: asker.display_name,
+      reputation: asker.reputation
+    }]),
+    tags: [(question)-[:TAGGED]->(tag:Tag) | tag.name],
     answers: {
-      answers: answers
+      answers: [(answer:Answer)-[:ANSWERS]->(question) | {
+        id: answer.id,
+        body: answer.body,
+        score: answer.score,
+        is_accepted: answer.is_accepted,
+        creation_date: toString(answer.creation_date),
+        provided_by: head([(provider:User)-[:PROVIDED]->(answer) | {
+          id: provider.id,
+          display_name: provider.display_name,
+          reputation: provider.reputation
+        }])
+      }]
     },
     community: {
-      questionCommunityId: qComm,
-      nodeCommunityId: nComm,
-      sameCommunity: sameCommunity
+      questionCommunityId: coalesce(question.CommunityId, [])
     },
-    simscore: score
-  } AS metadata,
-  score
+    simscore: simscore,
+    rrf_score: rrf_score
+  } END AS metadata,
+  rrf_score AS score
 ORDER BY score DESC
-LIMIT 50
 """
 
-# Create vector stores with error handling
-try:
-    stores = create_vector_stores(
-        get_graph_instance(), embedding_model(), retrieval_query
-    )
-    tagstore = stores.get("tagstore")
-    userstore = stores.get("userstore")
-    questionstore = stores.get("questionstore")
-    answerstore = stores.get("answerstore")
-
-    # Verify all stores were created
-    if not all([tagstore, userstore, questionstore, answerstore]):
-        logger.warning("Some vector stores were not created successfully")
-except Exception as e:
-    logger.error(f"Error creating vector stores: {e}")
-    raise
-
-# create compressor
-try:
-    compressor = CrossEncoderReranker(
-        model=reranker_model(),
-        top_n=10,  # This will return the top n most relevant documents.
-    )
-except Exception as e:
-    logger.error(f"Error creating compressor: {e}")
-    raise
+# Phase 2: hydrate full context for the reranked survivors only
+hydration_query = (
+    """
+UNWIND $hits AS hit
+MATCH (question:Question {id: hit.question_id})
+WITH question, hit.rrf_score AS rrf_score, hit.simscore AS simscore
+"""
+    + question_context_projection
+)
 
-# ===========================================================================================================================================================
-# Setting Up Retrievers from vectorstores for EnsembleRetriever
-# ===========================================================================================================================================================
+# Attach to the search indexes. "attach" (default) only checks the existing indexes and
+# leaves missing embeddings to the background backfill; "create" keeps the previous
+# from_existing_graph startup, which embeds every unembedded node before serving.
+STARTUP_INDEX_MODE = os.getenv("STARTUP_INDEX_MODE") or "attach"
 
 
-# Split retrieval into steps for observability
-def retrieve_raw_docs(question: str) -> List[Document]:
-    """Step 1: Graph Traversal & Ensemble Retrieval"""
+def load_search_indexes() -> List[Dict[str, str]]:
+    """Index pairs queried together by the hybrid search (lazy component)."""
     try:
-        # Define the common search arguments once
-        common_search_kwargs = {
-            "k": 50,  # Increased initial pool: wider net across all entity types
-            "score_threshold": 0.9,  # Slightly lowered to ensure we catch cross-domain links
-            "fetch_k": 10000,  # Number of candidates for the initial vector search
-            "lambda_mult": 0.5,  # Balanced weight between Vector and Full-text
-            "params": {
-                "embedding": embedding_model().embed_query(question),
-                "keyword_query": escape_lucene_chars(question),
-            },
-        }
+        if STARTUP_INDEX_MODE == "create":
+            stores = create_vector_stores(get_graph_instance(), embedding_model())
+
+            # Verify all stores were created
+            if len(stores) < 4:
+                logger.warning("Some vector stores were not created successfully")
+
+            hybrid_indexes = [
+                {"vector_index": s.index_name, "keyword_index": s.keyword_index_name}
+                for s in stores.values()
+            ]
+        else:
+            hybrid_indexes = attach_search_indexes(
+                get_graph_instance(), embedding_dimensions()
+            )
+        create_lookup_indexes(get_graph_instance())
+        return hybrid_indexes
+    except Exception as e:
+        logger.error(f"Error attaching search indexes: {e}")
+        raise
 
-        # Use a list of vectorstores, filtering out any that failed to initialize
-        vectorstores = [
-            s
-            for s in [tagstore, userstore, questionstore, answerstore]
-            if s is not None
-        ]
 
-        if not vectorstores:
-            logger.warning("No vector stores available for retrieval")
-            return []
+def load_compressor():
+    """Cross-encoder reranker (lazy component); loads the HuggingFace model via torch."""
+    from langchain_classic.retrievers.document_compressors.cross_encoder_rerank import (
+        CrossEncoderReranker,
+    )
 
-        # Create the retrievers using a list comprehension
-        retrievers = [
-            store.as_retriever(
-                search_type="similarity_score_threshold",
-                search_kwargs=common_search_kwargs,
-            )
-            for store in vectorstores
-        ]
+    try:
+        return CrossEncoderReranker(
+            model=reranker_model(),
+            top_n=10,  # This will return the top n most relevant documents.
+        )
+    except Exception as e:
+        logger.error(f"Error creating compressor: {e}")
+        raise
 
-        # Calculate equal weights dynamically
-        num_retrievers = len(retrievers)
-        weights = [1.0 / num_retrievers] * num_retrievers
 
-        # init ensemble retriever
-        ensemble_retriever = EnsembleRetriever(
-            retrievers=retrievers,
-            weights=weights,
+# ===========================================================================================================================================================
+# Hybrid Retrieval across all vector and keyword indexes
+# ===========================================================================================================================================================
+
+
+# Split retrieval into steps for observability; each step signals the agent stream
+def query_raw_docs(question: str) -> List[Document]:
+    """Runs the hybrid ranking query; errors propagate (used by the readiness warmup)."""
+    hybrid_indexes = components.get("search_indexes")
+    if not hybrid_indexes:
+        raise RuntimeError("No vector indexes available for retrieval")
+
+    params = {
+        "indexes": hybrid_indexes,
+        "k": 50,  # Candidates per vector / keyword index
+        "score_threshold": 0.9,  # Applied inside the database before fusion
+        "rrf_k": 60,  # Reciprocal-rank fusion damping constant
+        "top_k": 50,  # Fused questions returned
+        "rerank_body_chars": 500,  # Body prefix sent to the cross-encoder
+        "fanout_cap": TOP_QUESTIONS_FANOUT_CAP,  # Questions per Tag / User hit
+        "embedding": embed_query_cached(question),
+        "keyword_query": escape_lucene_chars(question),
+    }
+
+    rows = get_graph_instance().query(ranking_query, params=params)
+    return [
+        Document(
+            page_content=row["text"],
+            metadata={
+                "question_id": row["question_id"],
+                "rrf_score": row["rrf_score"],
+                "simscore": row["simscore"],
+            },
         )
+        for row in rows
+    ]
 
+
+@stage_signal("graph_traversal")
+def retrieve_raw_docs(question: str) -> List[Document]:
+    """Step 1: Graph Traversal & Hybrid Retrieval in a single Cypher round trip.
+
+    Returns lightweight candidates (question id, scores and a short rerank text);
+    full context is only hydrated for the documents that survive reranking.
+    """
+    try:
         logger.info(f"--- 🌐 GLOBAL RETRIEVAL: {question} ---")
-        docs = ensemble_retriever.invoke(question)
+        docs = query_raw_docs(question)
         logger.info(f"Graph Traversal Complete. Found {len(docs)} documents.")
         return docs
     except Exception as e:
@@ -258,6 +298,7 @@ def retrieve_raw_docs(question: str) -> List[Document]:
         return []
 
 
+@stage_signal("reranking")
 def rerank_docs(inputs: Dict) -> List[Document]:
     """Step 2: Reranking"""
     try:
@@ -270,6 +311,7 @@ def rerank_docs(inputs: Dict) -> List[Document]:
             return []
 
         logger.info(f"Reranking {len(docs)} documents...")
+        compressor = components.get("reranker")
         reranked_docs = compressor.compress_documents(documents=docs, query=question)
 
         # ✨ RELEVANCE GUARDRAIL: Filter by score
@@ -293,23 +335,78 @@ def rerank_docs(inputs: Dict) -> List[Document]:
         return []
 
 
+def hydrate_docs(docs: List[Document]) -> List[Document]:
+    """Step 3: Hydrate full question context for the reranked documents only"""
+    try:
+        if not docs:
+            return []
+
+        hits = [
+            {
+                "question_id": doc.metadata.get("question_id"),
+                "rrf_score": doc.metadata.get("rrf_score"),
+                "simscore": doc.metadata.get("simscore"),
+            }
+            for doc in docs
+        ]
+        rows = get_graph_instance().query(hydration_query, params={"hits": hits})
+        rows_by_id = {row["metadata"]["question_details"]["id"]: row for row in rows}
+
+        # Preserve the reranked order and carry the cross-encoder score over
+        hydrated_docs = []
+        for doc in docs:
+            row = rows_by_id.get(doc.metadata.get("question_id"))
+            if row is None:
+                continue
+            metadata = row["metadata"]
+            metadata["relevance_score"] = doc.metadata.get("relevance_score")
+            hydrated_docs.append(Document(page_content=row["text"], metadata=metadata))
+
+        logger.info(f"Hydrated {len(hydrated_docs)} documents with full context.")
+        return hydrated_docs
+    except Exception as e:
+        logger.error(f"Error in hydrate_docs: {e}")
+        return []
+
+
 # ===========================================================================================================================================================
 # Chain Assembly
 # ===========================================================================================================================================================
 
-# 1. Retrieval Sequence: Fetch -> Rerank
-retrieval_chain = RunnablePassthrough.assign(
-    docs=lambda x: RunnableLambda(retrieve_raw_docs)
-    .with_config(run_name="GraphTraversal")
-    .invoke(x["question"])
-) | RunnableLambda(rerank_docs).with_config(run_name="Reranking")
+# 1. Retrieval Sequence: Fetch ids -> Rerank -> Hydrate survivors
+retrieval_chain = (
+    RunnablePassthrough.assign(
+        docs=lambda x: (
+            RunnableLambda(retrieve_raw_docs)
+            .with_config(run_name="GraphTraversal")
+            .invoke(x["question"])
+        )
+    )
+    | RunnableLambda(rerank_docs).with_config(run_name="Reranking")
+    | RunnableLambda(hydrate_docs).with_config(run_name="Hydration")
+)
+
+
+async def aretrieve_context(inputs: Dict, config: RunnableConfig) -> List[Document]:
+    """Retrieval step of the tool, served from the run's speculative retrieval on a match."""
+    docs = await claim_speculative_docs(inputs["question"])
+    if docs is not None:
+        emit_stage("speculative_retrieval", "complete", count=len(docs))
+        return docs
+    return await retrieval_chain.ainvoke(inputs, config)
+
+
+# Tool retrieval: reuses the run's speculative retrieval when it matches
+retrieval_step = RunnableLambda(
+    lambda x, config: retrieval_chain.invoke(x, config), afunc=aretrieve_context
+)
 
 # 2. Main GraphRAG Chain
 # Flow: Input -> Context/History Prep -> Topic Analysis -> LLM Generation
 try:
     # Prepare inputs for the LLM (Context + History)
     input_preparation = RunnablePassthrough.assign(
-        context=retrieval_chain | format_docs_with_metadata,
+        context=retrieval_step | format_docs_with_metadata,
         chat_history_formatted=lambda x: format_chat_history(x.get("chat_history", [])),
     )
 
@@ -368,15 +465,19 @@ class GraphRAGTool(BaseTool):
         if not isinstance(chat_history, list):
             # Fallback if LLM sends a string or other type
             chat_history = []
-        result = graph_rag_chain.invoke(
-            {
-                "question": question,
-                "chat_history": chat_history,
-                "session_topic": session_topic,
-                "session_id": session_id,
-            },
-            config={"callbacks": run_manager.get_child() if run_manager else None},
-        )
+        emit_stage("tool_start", "running", tool=self.name)
+        try:
+            result = graph_rag_chain.invoke(
+                {
+                    "question": question,
+                    "chat_history": chat_history,
+                    "session_topic": session_topic,
+                    "session_id": session_id,
+                },
+                config={"callbacks": run_manager.get_child() if run_manager else None},
+            )
+        finally:
+            emit_stage("tool_end", "complete", tool=self.name)
         return result.to_string()
 
     # asynchronous execution
@@ -394,15 +495,19 @@ class GraphRAGTool(BaseTool):
             chat_history = []
         if not isinstance(chat_history, list):
             chat_history = []
-        result = await graph_rag_chain.ainvoke(
-            {
-                "question": question,
-                "chat_history": chat_history,
-                "session_topic": session_topic,
-                "session_id": session_id,
-            },
-            config={"callbacks": run_manager.get_child() if run_manager else None},
-        )
+        emit_stage("tool_start", "running", tool=self.name)
+        try:
+            result = await graph_rag_chain.ainvoke(
+                {
+                    "question": question,
+                    "chat_history": chat_history,
+                    "session_topic": session_topic,
+                    "session_id": session_id,
+                },
+                config={"callbacks": run_manager.get_child() if run_manager else None},
+            )
+        finally:
+            emit_stage("tool_end", "complete", tool=self.name)
         return result.to_string()
 
 
@@ -0,0 +1,141 @@
+"""Speculative retrieval: the tool's retrieval for the raw question, overlapped with the agent's first LLM call"""
+
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from agent.streaming import cancellation_scope
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# Opt-in: run the retrieval chain for the raw question while the agent's first LLM call
+# decides whether to call the tool, and hand the result to the tool when it asks for
+# (nearly) the same question. Costs a wasted retrieval when the tool is not called.
+SPECULATIVE_RETRIEVAL = (os.getenv("SPECULATIVE_RETRIEVAL") or "off").lower() == "on"
+# Minimum word overlap (Jaccard) between the raw and the tool's question for a reuse
+SPECULATIVE_MATCH_THRESHOLD = float(os.getenv("SPECULATIVE_MATCH_THRESHOLD") or 0.8)
+
+_speculation: ContextVar[Optional["SpeculativeRetrieval"]] = ContextVar(
+    "speculative_retrieval", default=None
+)
+
+
+def questions_match(a: str, b: str) -> bool:
+    """True when two questions share enough words to be answered by the same retrieval."""
+    terms_a = set(re.findall(r"\w+", a.lower()))
+    terms_b = set(re.findall(r"\w+", b.lower()))
+    if not terms_a or not terms_b:
+        return terms_a == terms_b
+    overlap = len(terms_a & terms_b) / len(terms_a | terms_b)
+    return overlap >= SPECULATIVE_MATCH_THRESHOLD
+
+
+class SpeculativeRetrieval:
+    """
+    Retrieval for the raw question, started before the agent asks for it. It runs under
+    its own cancel event: cancelling the task does not stop a step already handed to a
+    worker thread, but the event makes the steps after it skip.
+    """
+
+    def __init__(self, question: str):
+        self.question = question
+        self.claimed = False
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.cancelled = threading.Event()
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self) -> List[Document]:
+        try:
+            # Imported here: the tool module pulls in the retrieval chain
+            from tools.graph_rag_tool import retrieval_chain
+
+            # The task runs in a copy of the context, so this scope is its own
+            with cancellation_scope(self.cancelled):
+                return await retrieval_chain.ainvoke({"question": self.question})
+        finally:
+            self.finished = time.perf_counter()
+
+    def _cancel(self) -> None:
+        self.cancelled.set()
+        if not self.task.done():
+            self.task.cancel()
+
+    async def claim(self, question: str) -> Optional[List[Document]]:
+        """The prefetched documents if they answer `question`; None means retrieve normally."""
+        if self.claimed:
+            return None  # Later tool calls in the same run retrieve on their own
+        self.claimed = True
+        if not questions_match(self.question, question):
+            metrics.incr("speculative_retrieval.misses")
+            self._cancel()
+            return None
+
+        # Retrieval time the tool no longer waits for: all of it if already finished
+        saved = (self.finished or time.perf_counter()) - self.started
+        try:
+            docs = await self.task
+        except Exception as e:
+            logger.warning(f"Speculative retrieval failed, retrieving again: {e}")
+            metrics.incr("speculative_retrieval.misses")
+            return None
+        metrics.incr("speculative_retrieval.hits")
+        metrics.incr("speculative_retrieval.seconds_saved", saved)
+        return docs
+
+    def discard(self) -> None:
+        if not self.claimed:
+            metrics.incr("speculative_retrieval.unused")
+        self._cancel()
+
+
+@contextmanager
+def speculative_retrieval(question: str):
+    """Starts a speculative retrieval for this agent run when SPECULATIVE_RETRIEVAL is on."""
+    if not SPECULATIVE_RETRIEVAL:
+        yield None
+        return
+    speculation = SpeculativeRetrieval(question)
+    token = _speculation.set(speculation)
+    try:
+        yield speculation
+    finally:
+        _speculation.reset(token)
+        speculation.discard()
+
+
+async def claim_speculative_docs(question: str) -> Optional[List[Document]]:
+    """Documents prefetched for this agent run if they answer `question`, else None."""
+    speculation = _speculation.get()
+    if speculation is None:
+        return None
+    return await speculation.claim(question)
+
+
+def speculative_retrieval_stats() -> Dict:
+    """Hit, miss and unused rates over all speculations, and the retrieval time saved."""
+    counters = metrics.snapshot()["counters"]
+    hits = counters.get("speculative_retrieval.hits", 0)
+    misses = counters.get("speculative_retrieval.misses", 0)
+    unused = counters.get("speculative_retrieval.unused", 0)
+    started = hits + misses + unused
+    return {
+        "enabled": SPECULATIVE_RETRIEVAL,
+        "hit_rate": round(hits / started, 3) if started else 0.0,
+        "miss_rate": round(misses / started, 3) if started else 0.0,
+        "unused_rate": round(unused / started, 3) if started else 0.0,
+        "seconds_saved": round(
+            counters.get("speculative_retrieval.seconds_saved", 0), 3
+        ),
+    }
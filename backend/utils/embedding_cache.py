@@ -0,0 +1,173 @@
+"""Persistent, content-addressed embedding cache for ingestion"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from setup.init_config import embedding_model
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH") or os.path.join(
+    os.path.expanduser("~"), ".cache", "stackexchange_agent", "embeddings.sqlite3"
+)
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB") or 1024)
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed embedding cache keyed by model name plus a SHA-256 of the exact
+    embedded text. Vectors are stored as float32 blobs and the least recently used
+    entries are evicted once the stored vectors exceed `max_bytes`.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT coalesce(sum(size), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model_name}:{digest}"
+
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        """Returns the cached vector for each key, or None on a miss."""
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                found.update(rows)
+                self._conn.execute(
+                    f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})",
+                    [time.time(), *chunk],
+                )
+            self._conn.commit()
+
+        return [
+            np.frombuffer(found[key], dtype=np.float32).tolist()
+            if key in found
+            else None
+            for key in keys
+        ]
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]) -> None:
+        """Stores vectors and evicts least recently used entries past the size limit."""
+        now = time.time()
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                blob = np.asarray(vector, dtype=np.float32).tobytes()
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO embeddings (key, vector, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, blob, len(blob), now),
+                )
+                if cursor.rowcount:
+                    self._total_bytes += len(blob)
+            self._conn.commit()
+
+            if self._total_bytes > self.max_bytes:
+                self._evict(target_bytes=int(self.max_bytes * 0.9))
+
+    def _evict(self, target_bytes: int) -> None:
+        """Deletes the least recently used entries until the cache fits `target_bytes`."""
+        to_free = self._total_bytes - target_bytes
+        freed, victims = 0, []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM embeddings ORDER BY last_used ASC"
+        ):
+            if freed >= to_free:
+                break
+            victims.append((key,))
+            freed += size
+
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+        self._conn.commit()
+        self._total_bytes -= freed
+        logger.info(
+            f"Embedding cache evicted {len(victims)} entries ({freed / 1e6:.1f} MB)"
+        )
+
+
+_cache_instance = None
+_cache_instance_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get or create the process-wide embedding cache."""
+    global _cache_instance
+    if _cache_instance is None:
+        # Ingest workers may ask concurrently; only one of them opens the database
+        with _cache_instance_lock:
+            if _cache_instance is None:
+                _cache_instance = EmbeddingCache(
+                    EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_MB * 1024 * 1024
+                )
+    return _cache_instance
+
+
+def embed_documents_cached(texts: List[str]) -> List[List[float]]:
+    """
+    Embeds `texts`, sending only cache misses to the embedding model.
+    Falls back to embedding everything if the cache is unavailable.
+    """
+    model = embedding_model()
+    try:
+        cache = get_embedding_cache()
+    except Exception as e:
+        logger.error(f"Embedding cache unavailable, embedding without it: {e}")
+        return model.embed_documents(texts)
+
+    keys = [EmbeddingCache.make_key(model.model, text) for text in texts]
+    vectors = cache.get_many(keys)
+
+    # Embed each distinct missing text once, even if it repeats within the batch
+    miss_idx = [i for i, vector in enumerate(vectors) if vector is None]
+    miss_keys = list(dict.fromkeys(keys[i] for i in miss_idx))
+    if miss_keys:
+        first_idx = {}
+        for i in miss_idx:
+            first_idx.setdefault(keys[i], i)
+        new_vectors = model.embed_documents([texts[first_idx[k]] for k in miss_keys])
+        cache.put_many(miss_keys, new_vectors)
+        by_key = dict(zip(miss_keys, new_vectors))
+        for i in miss_idx:
+            vectors[i] = by_key[keys[i]]
+
+    logger.info(
+        f"Embedding cache: {len(texts) - len(miss_idx)} hits, {len(miss_idx)} misses"
+    )
+    return vectors
@@ -1,191 +1,385 @@
-from langchain_neo4j import Neo4jChatMessageHistory, Neo4jGraph
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 from setup.init_config import (
-    NEO4J_URL,
-    NEO4J_USERNAME,
-    NEO4J_PASSWORD,
+    embedding_model,
     get_graph_instance,
 )
+from utils.metrics import metrics
+from utils.query_embedding import embed_query_cached
+from collections import OrderedDict
 from datetime import datetime
+from dotenv import load_dotenv
+from typing import Dict, List, Optional
 import logging
+import os
+import threading
 
 logger = logging.getLogger(__name__)
 
 
+# ===========================================================================================================================================================
+# Chat history on the shared driver, with a write-through LRU of recent sessions
+# ===========================================================================================================================================================
+load_dotenv()
+CHAT_HISTORY_CACHE_SIZE = int(os.getenv("CHAT_HISTORY_CACHE_SIZE") or 256)
+CHAT_HISTORY_WINDOW = 3  # Turns returned as history, as in Neo4jChatMessageHistory
+
+# Same linked list as Neo4jChatMessageHistory: (Session)-[:LAST_MESSAGE]->(Message),
+# older messages reachable through [:NEXT]
+history_read_query = """
+MATCH (s:Session {id: $session_id})-[:LAST_MESSAGE]->(last_message)
+MATCH p = (last_message)<-[:NEXT*0..%d]-()
+WITH p, length(p) AS length ORDER BY length DESC LIMIT 1
+UNWIND reverse(nodes(p)) AS node
+RETURN node.type AS type, node.content AS content
+""" % (CHAT_HISTORY_WINDOW * 2)
+
+SESSION_PREVIEW_CHARS = 200  # Characters of the last message kept on the Session
+
+# One write per turn: optional user/session link, the message itself, the linked-list
+# pointers and the denormalized session metadata used by the session listings.
+append_message_query = """
+MERGE (s:Session {id: $session_id})
+ON CREATE SET s.topic = $topic
+// Setting a property first takes the session's write lock, serializing appends
+SET s.last_message_at = $timestamp,
+    s.last_message_preview = left($content, $preview_chars)
+FOREACH (_ IN CASE WHEN $user_id IS NULL THEN [] ELSE [1] END |
+    MERGE (u:AppUser {id: $user_id})
+    MERGE (u)-[:HAS_SESSION]->(s)
+)
+WITH s
+OPTIONAL MATCH (s)-[lm:LAST_MESSAGE]->(last_message)
+CREATE (s)-[:LAST_MESSAGE]->(m:Message {
+    type: $type, content: $content, created_at: $timestamp,
+    thought: $thought, embedding: $embedding, truncated: $truncated
+})
+CREATE (s)-[:HAS_MESSAGE]->(m)
+WITH m, lm, last_message WHERE last_message IS NOT NULL
+CREATE (last_message)-[:NEXT]->(m)
+DELETE lm
+"""
+
+history_clear_query = """
+MATCH (s:Session {id: $session_id})-[:LAST_MESSAGE]->(last_message)
+MATCH p = (last_message)<-[:NEXT*0..]-()
+UNWIND nodes(p) AS node
+DETACH DELETE node
+"""
+
+# Stored types: LangChain's human/ai, or user/assistant once the app tags the message
+_MESSAGE_TYPES = {"human": HumanMessage, "user": HumanMessage}
+
+
+def _to_message(message_type: str, content: str) -> BaseMessage:
+    if message_type == "system":
+        return SystemMessage(content=content)
+    return _MESSAGE_TYPES.get(message_type, AIMessage)(content=content)
+
+
+class _SessionCache:
+    """Thread-safe LRU of the last history window of recently used sessions."""
+
+    def __init__(self, max_sessions: int):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, List[BaseMessage]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[List[BaseMessage]]:
+        with self._lock:
+            messages = self._sessions.get(session_id)
+            if messages is None:
+                return None
+            self._sessions.move_to_end(session_id)
+            return list(messages)
+
+    def put(self, session_id: str, messages: List[BaseMessage]) -> None:
+        with self._lock:
+            self._sessions[session_id] = list(messages)[
+                -(CHAT_HISTORY_WINDOW * 2 + 1) :
+            ]
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def append(self, session_id: str, message: BaseMessage) -> None:
+        # Write-through: only sessions already cached are updated; others load on read
+        with self._lock:
+            messages = self._sessions.get(session_id)
+            if messages is None:
+                return
+            messages.append(message)
+            del messages[: -(CHAT_HISTORY_WINDOW * 2 + 1)]
+
+    def invalidate(self, session_id: Optional[str] = None) -> None:
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session_id, None)
+
+
+_session_cache = _SessionCache(CHAT_HISTORY_CACHE_SIZE)
+
+
+class Neo4jSessionHistory(BaseChatMessageHistory):
+    """
+    Chat history with the same graph layout as Neo4jChatMessageHistory, but running on
+    the pooled driver of `get_graph_instance` instead of opening a driver per call.
+    Reads are served from a write-through LRU once a session has been loaded; a failed
+    read returns an empty history.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        cached = _session_cache.get(self.session_id)
+        if cached is not None:
+            metrics.incr("chat_history.cache_hits")
+            return cached
+
+        metrics.incr("chat_history.cache_misses")
+        try:
+            rows = get_graph_instance().query(
+                history_read_query, params={"session_id": self.session_id}
+            )
+        except Exception as e:
+            # An empty history that won't crash the agent; not cached, so the next read retries
+            logger.error(
+                f"Error getting chat history for session {self.session_id}: {e}"
+            )
+            return []
+        messages = [_to_message(row["type"], row["content"]) for row in rows]
+        _session_cache.put(self.session_id, messages)
+        return messages
+
+    def add_message(self, message: BaseMessage) -> None:
+        self.append(message)
+
+    def append(
+        self,
+        message: BaseMessage,
+        thought: Optional[str] = None,
+        embedding: Optional[List[float]] = None,
+        user_id: Optional[str] = None,
+        topic: Optional[str] = None,
+        truncated: bool = False,
+    ) -> None:
+        """Stores a message, its metadata and the session link in a single write."""
+        message_type = {"human": "user", "ai": "assistant"}.get(
+            message.type, message.type
+        )
+        get_graph_instance().query(
+            append_message_query,
+            params={
+                "session_id": self.session_id,
+                "type": message_type,
+                "content": message.content,
+                "timestamp": datetime.now().isoformat(),
+                "thought": thought,
+                "embedding": embedding,
+                "user_id": user_id or None,
+                "topic": topic or None,
+                "preview_chars": SESSION_PREVIEW_CHARS,
+                "truncated": truncated,
+            },
+        )
+        _session_cache.append(self.session_id, message)
+
+    def clear(self) -> None:
+        get_graph_instance().query(
+            history_clear_query, params={"session_id": self.session_id}
+        )
+        _session_cache.invalidate(self.session_id)
+
+
 def get_chat_history(session_id: str):
     """
-    Returns a chat message history object stored in Neo4j.
+    Returns the chat message history of a session stored in Neo4j.
     It creates a node for the session and links messages to it.
     """
+    return Neo4jSessionHistory(session_id)
+
+
+def _embed_message(content: str, query: bool = False):
+    """Embedding stored on a Message node; None if embedding fails (filled in on read)."""
     try:
-        return Neo4jChatMessageHistory(
-            session_id=session_id,
-            url=NEO4J_URL,
-            username=NEO4J_USERNAME,
-            password=NEO4J_PASSWORD,
-        )
+        if query:
+            return embed_query_cached(content)
+        return embedding_model().embed_query(content)
     except Exception as e:
-        logger.error(f"Error getting chat history for session {session_id}: {e}")
+        logger.warning(f"Could not embed message, it will be embedded on read: {e}")
+        return None
 
-        # Return an empty history object that won't crash
-        class EmptyHistory:
-            messages = []
 
-        return EmptyHistory()
+def get_session_message_vectors(session_id: str) -> List[Dict]:
+    """
+    Returns the session's messages in creation order with their stored embeddings.
+    Messages stored before embeddings were persisted are embedded once, in one batch,
+    and written back.
+    """
+    graph = get_graph_instance()
+    rows = graph.query(
+        """
+        MATCH (:Session {id: $session_id})-[:HAS_MESSAGE]->(m:Message)
+        RETURN elementId(m) AS element_id, m.content AS content, m.type AS role,
+               m.embedding AS embedding
+        ORDER BY coalesce(m.created_at, m.timestamp, elementId(m))
+        """,
+        params={"session_id": session_id},
+    )
+
+    missing = [row for row in rows if row["embedding"] is None and row["content"]]
+    if missing:
+        vectors = embedding_model().embed_documents([row["content"] for row in missing])
+        for row, vector in zip(missing, vectors):
+            row["embedding"] = vector
+        graph.query(
+            """
+            UNWIND $rows AS row
+            MATCH (m:Message) WHERE elementId(m) = row.element_id
+            SET m.embedding = row.embedding
+            """,
+            params={
+                "rows": [
+                    {"element_id": row["element_id"], "embedding": row["embedding"]}
+                    for row in missing
+                ]
+            },
+        )
+        logger.info(f"Embedded {len(missing)} stored messages of session {session_id}")
+    return rows
 
 
-def add_user_message_to_session(session_id: str, content: str):
+def add_user_message_to_session(
+    session_id: str, content: str, user_id: str = "", topic: str = ""
+):
     """
-    Adds a user message to the session and explicitly creates a HAS_MESSAGE relationship.
+    Adds a user message to the session in one write. With `user_id`, the session is
+    also linked to the AppUser; `topic` is only stored when the session is created.
     """
     try:
-        # 1. Add message via LangChain (creates node + linked list + LAST_MESSAGE)
-        history = get_chat_history(session_id)
-        history.add_user_message(content)
-
-        # 2. Enforce HAS_MESSAGE relationship using the LAST_MESSAGE pointer
-        # FIX: Also set created_at timestamp and use pooled connection
-        graph = get_graph_instance()
-        # Match the session and the message marked as LAST_MESSAGE (which is the one just added)
-        # Then create HAS_MESSAGE and set created_at
-        # MATCH (s:Session {id: $session_id})-[:LAST_MESSAGE]->(m:Message)
-        # SET m.created_at = $timestamp
-        # MERGE (s)-[:HAS_MESSAGE]->(m)
-        query = """
-        MATCH (s:Session {id: $session_id})-[:LAST_MESSAGE]->(m:Message)
-        SET m.created_at = $timestamp, m.type = 'user'
-        MERGE (s)-[:HAS_MESSAGE]->(m)
-        """
-        graph.query(
-            query,
-            params={"session_id": session_id, "timestamp": datetime.now().isoformat()},
+        get_chat_history(session_id).append(
+            HumanMessage(content=content),
+            # Same text as the question, so the request's query embedding is reused
+            embedding=_embed_message(content, query=True),
+            user_id=user_id,
+            topic=topic,
         )
         logger.debug(f"User message added to session {session_id}")
     except Exception as e:
         logger.error(f"Error adding user message to session {session_id}: {e}")
 
 
-def add_ai_message_to_session(session_id: str, content: str, thought: str):
+def add_ai_message_to_session(
+    session_id: str, content: str, thought: str, truncated: bool = False
+):
     """
-    Adds an AI message to the session and explicitly creates a HAS_MESSAGE relationship.
-    Also stores the reasoning/thought process if provided.
+    Adds an AI message to the session in one write.
+    Also stores the reasoning/thought process if provided, and whether the answer was
+    cut short because the client disconnected.
     """
     try:
-        history = get_chat_history(session_id)
-        history.add_ai_message(content)
-
-        # FIX: Use pooled connection
-        graph = get_graph_instance()
-        # Match the session and the message marked as LAST_MESSAGE
-        # Set the thought property, created_at, and create HAS_MESSAGE
-        query = """
-        MATCH (s:Session {id: $session_id})-[:LAST_MESSAGE]->(m:Message)
-        SET m.thought = $thought, m.created_at = $timestamp, m.type = 'assistant'
-        MERGE (s)-[:HAS_MESSAGE]->(m)
-        """
-        graph.query(
-            query,
-            params={
-                "session_id": session_id,
-                "thought": thought,
-                "timestamp": datetime.now().isoformat(),
-            },
+        get_chat_history(session_id).append(
+            AIMessage(content=content),
+            thought=thought,
+            embedding=_embed_message(content),
+            truncated=truncated,
         )
         logger.debug(
             f"AI message added to session {session_id} with thought (length {len(thought if thought else '')})"
         )
-
     except Exception as e:
         logger.error(f"Error adding AI message to session {session_id}: {e}")
 
 
-def get_all_sessions():
-    """
-    Retrieves all chat sessions stored in Neo4j.
-    Returns a list of dicts with session_id and last_message details.
-    """
-    try:
-        # FIX: Use pooled connection
-        graph = get_graph_instance()
+# Sessions listed newest first from the denormalized Session.last_message_at, with keyset
+# pagination on (last_message_at, id); no message of any session is read.
+SESSION_PAGE_SIZE = 100
+SESSION_PAGE_SIZE_MAX = 500
 
-        # FIX: Optimize query - avoid unbounded traversal [*0..], limit results
-        query = """
-        MATCH (s:Session)
-        OPTIONAL MATCH (s)-[:HAS_MESSAGE]->(m:Message)
-        WITH s, m ORDER BY coalesce(m.created_at, m.timestamp, elementId(m)) DESC
-        WITH s, head(collect(m)) AS last_msg
-        RETURN s.id AS session_id, last_msg.content AS last_message
-        LIMIT 100
-        """
+sessions_page_projection = """
+WITH s ORDER BY s.last_message_at DESC, s.id DESC LIMIT $limit
+RETURN s.id AS session_id, s.last_message_preview AS last_message,
+       s.last_message_at AS last_message_at
+"""
+
+sessions_keyset_filter = """
+WHERE s.last_message_at IS NOT NULL
+  AND ($before_at IS NULL OR s.last_message_at < $before_at
+       OR (s.last_message_at = $before_at AND s.id < $before_id))
+"""
+
+
+def _keyset_params(limit: int, before: Optional[str]) -> Dict:
+    before_at, _, before_id = (before or "").partition("|")
+    return {
+        "limit": limit,
+        "before_at": before_at or None,
+        "before_id": before_id or "",
+    }
 
-        return graph.query(query)
-    except Exception as e:
-        logger.error(f"Error getting all sessions: {e}")
-        return []
 
+def session_page_cursor(sessions: List[Dict], limit: int) -> Optional[str]:
+    """Cursor for the next page, or None when this page is the last one."""
+    if len(sessions) < limit:
+        return None
+    last = sessions[-1]
+    return f"{last['last_message_at']}|{last['session_id']}"
 
-def link_session_to_user(session_id: str, user_id: str, topic: str):
+
+def get_user_sessions(
+    user_id: str, limit: int = SESSION_PAGE_SIZE, before: Optional[str] = None
+):
     """
-    Links a session to an AppUser. Creates the user if not exists.
-    Optionally stores the conversation topic for the session.
+    Retrieves chat sessions for a specific user, most recently active first.
+    Returns a list of dicts with session_id and last_message details.
     """
-    if not user_id:
-        return
-
     try:
         # FIX: Use pooled connection
         graph = get_graph_instance()
-
-        # Set topic on the session if provided (typically on first message)
-        if topic:
-            query = """
-            MERGE (u:AppUser {id: $user_id})
-            MERGE (s:Session {id: $session_id})
-            ON CREATE SET s.topic = $topic
-            MERGE (u)-[:HAS_SESSION]->(s)
-            """
-            graph.query(
-                query,
-                params={"user_id": user_id, "session_id": session_id, "topic": topic},
-            )
-        else:
-            query = """
-            MERGE (u:AppUser {id: $user_id})
-            MERGE (s:Session {id: $session_id})
-            MERGE (u)-[:HAS_SESSION]->(s)
-            """
-            graph.query(query, params={"user_id": user_id, "session_id": session_id})
-
-        logger.debug(
-            f"Linked session {session_id} to user {user_id}"
-            + (f" with topic: {topic}" if topic else "")
+        query = (
+            "MATCH (:AppUser {id: $user_id})-[:HAS_SESSION]->(s:Session)"
+            + sessions_keyset_filter
+            + sessions_page_projection
+        )
+        return graph.query(
+            query, params={"user_id": user_id, **_keyset_params(limit, before)}
         )
     except Exception as e:
-        logger.error(f"Error linking session to user: {e}")
+        logger.error(f"Error getting sessions for user {user_id}: {e}")
+        return []
 
 
-def get_user_sessions(user_id: str):
+def init_session_metadata() -> None:
     """
-    Retrieves chat sessions for a specific user.
-    Returns a list of dicts with session_id and last_message details.
+    Creates the Session.last_message_at index and fills the denormalized last-message
+    fields of sessions written before they existed, from their LAST_MESSAGE pointer.
     """
     try:
-        # FIX: Use pooled connection
         graph = get_graph_instance()
-
-        # FIX: Optimize query - avoid unbounded traversal, limit results, use correct order
-        query = """
-        MATCH (u:AppUser {id: $user_id})-[:HAS_SESSION]->(s:Session)
-        OPTIONAL MATCH (s)-[:HAS_MESSAGE]->(m:Message)
-        WITH s, m ORDER BY coalesce(m.created_at, m.timestamp, elementId(m)) DESC
-        WITH s, head(collect(m)) AS last_msg
-        RETURN s.id AS session_id, last_msg.content AS last_message
-        LIMIT 100
-        """
-
-        return graph.query(query, params={"user_id": user_id})
+        graph.query(
+            "CREATE INDEX session_last_message_at IF NOT EXISTS "
+            "FOR (s:Session) ON (s.last_message_at)"
+        )
+        result = graph.query(
+            """
+            MATCH (s:Session)-[:LAST_MESSAGE]->(m:Message)
+            WHERE s.last_message_at IS NULL
+            SET s.last_message_at = coalesce(m.created_at, m.timestamp, ''),
+                s.last_message_preview = left(m.content, $preview_chars)
+            RETURN count(s) AS updated
+            """,
+            params={"preview_chars": SESSION_PREVIEW_CHARS},
+        )
+        if result and result[0]["updated"]:
+            logger.info(
+                f"Backfilled last-message fields on {result[0]['updated']} sessions"
+            )
     except Exception as e:
-        logger.error(f"Error getting sessions for user {user_id}: {e}")
-        return []
+        logger.error(f"Error initializing session metadata: {e}")
 
 
 def get_all_users():
@@ -217,6 +411,7 @@ def delete_session(session_id: str):
         DETACH DELETE m, s
         """
         graph.query(query, params={"session_id": session_id})
+        _session_cache.invalidate(session_id)
         logger.info(f"Session {session_id} deleted")
     except Exception as e:
         logger.error(f"Error deleting session {session_id}: {e}")
@@ -236,6 +431,8 @@ def delete_user(user_id: str):
         DETACH DELETE m, s, u
         """
         graph.query(query, params={"user_id": user_id})
+        # Rare: drop every cached session rather than looking up the user's sessions
+        _session_cache.invalidate()
         logger.info(f"User {user_id} and all their data deleted")
     except Exception as e:
         logger.error(f"Error deleting user {user_id}: {e}")
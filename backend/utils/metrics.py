@@ -0,0 +1,59 @@
+"""Process-wide counters and stage timings, exposed on /api/v1/metrics"""
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict
+
+
+class Metrics:
+    """
+    Thread-safe counters plus per-stage timings. A stage records how many times it
+    ran, the wall time spent in it and how many items it handled, which yields its
+    throughput in items per second.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._stages: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"calls": 0, "seconds": 0.0, "items": 0}
+        )
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, stage: str, seconds: float, items: int = 0) -> None:
+        with self._lock:
+            stats = self._stages[stage]
+            stats["calls"] += 1
+            stats["seconds"] += seconds
+            stats["items"] += items
+
+    @contextmanager
+    def timer(self, stage: str, items: int = 0):
+        """Times the enclosed block as one call of `stage`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, items)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            stages = {
+                name: {
+                    **stats,
+                    "seconds": round(stats["seconds"], 3),
+                    "items_per_second": round(stats["items"] / stats["seconds"], 2)
+                    if stats["seconds"]
+                    else 0.0,
+                }
+                for name, stats in self._stages.items()
+            }
+            return {"counters": dict(self._counters), "stages": stages}
+
+
+metrics = Metrics()
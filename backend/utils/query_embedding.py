@@ -0,0 +1,81 @@
+"""Query embeddings computed once per request, backed by a small process-wide LRU"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from setup.init_config import embedding_model
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE") or 256)
+
+# Per-request memo of text -> vector plus its counters; None outside a request scope.
+# The dict is shared (not copied) with threads and tasks spawned by the request.
+_request_scope: ContextVar[Optional[Dict]] = ContextVar(
+    "query_embeddings", default=None
+)
+
+_lru: "OrderedDict[str, List[float]]" = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+@contextmanager
+def query_embedding_scope(name: str = "request"):
+    """
+    Opens a request scope: every `embed_query_cached` call inside it shares one memo.
+    Yields the scope's counters (computed, request_hits, lru_hits).
+    """
+    scope = {"vectors": {}, "computed": 0, "request_hits": 0, "lru_hits": 0}
+    token = _request_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _request_scope.reset(token)
+        saved = scope["request_hits"] + scope["lru_hits"]
+        if scope["computed"] or saved:
+            metrics.incr("query_embedding.calls_saved", saved)
+            logger.info(
+                f"Query embeddings for {name}: {scope['computed']} computed, "
+                f"{scope['request_hits']} reused in request, {scope['lru_hits']} from LRU"
+            )
+
+
+def embed_query_cached(text: str) -> List[float]:
+    """Embeds a query once per request; repeated questions are served from the LRU."""
+    scope = _request_scope.get()
+    if scope is not None and text in scope["vectors"]:
+        scope["request_hits"] += 1
+        metrics.incr("query_embedding.request_hits")
+        return scope["vectors"][text]
+
+    model = embedding_model()
+    key = f"{model.model}:{text}"
+    with _lru_lock:
+        vector = _lru.get(key)
+        if vector is not None:
+            _lru.move_to_end(key)
+
+    if vector is not None:
+        counter = "lru_hits"
+    else:
+        counter = "computed"
+        vector = model.embed_query(text)
+        with _lru_lock:
+            _lru[key] = vector
+            if len(_lru) > QUERY_EMBEDDING_CACHE_SIZE:
+                _lru.popitem(last=False)
+
+    metrics.incr(f"query_embedding.{counter}")
+    if scope is not None:
+        scope[counter] += 1
+        scope["vectors"][text] = vector
+    return vector
@@ -0,0 +1,173 @@
+"""Server-sent events writer: coalesced token frames, cached status frames and event ids"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from utils.metrics import metrics
+
+try:
+    import orjson
+except ImportError:  # Falls back to the stdlib encoder
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# Token chunks are buffered until the oldest is SSE_FLUSH_MS old or the buffer holds
+# SSE_FLUSH_BYTES of text; any other event flushes the buffer first. Setting either to
+# 0 sends every chunk as its own frame.
+SSE_FLUSH_MS = float(os.getenv("SSE_FLUSH_MS") or 50)
+SSE_FLUSH_BYTES = int(os.getenv("SSE_FLUSH_BYTES") or 1024)
+# Distinct status payloads kept pre-encoded
+SSE_FRAME_CACHE_SIZE = 256
+
+_DONE = object()
+# Producers outlive a cancelled response while they persist partial results
+_producers = set()
+
+
+def encode_json(event: Dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(event)
+    return json.dumps(event, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class SSEWriter:
+    """
+    Turns stream events into SSE frames with increasing `id:` fields, prefixed with the
+    stream id when one is given ("<stream_id>-<n>") so a reconnect names its stream.
+
+    Token events are merged into one frame per flush window. Status payloads repeat
+    across requests, so their `data:` line is encoded once and reused.
+    """
+
+    _frame_cache: Dict[tuple, bytes] = {}
+
+    def __init__(
+        self,
+        flush_ms: float = SSE_FLUSH_MS,
+        flush_bytes: int = SSE_FLUSH_BYTES,
+        stream_id: str = "",
+    ):
+        self.id_prefix = f"{stream_id}-".encode() if stream_id else b""
+        self.flush_seconds = flush_ms / 1000
+        self.flush_bytes = flush_bytes
+        self.last_event_id = 0
+        self._content: List[str] = []
+        self._reasoning: List[str] = []
+        self._pending_bytes = 0
+        self._pending_since: Optional[float] = None
+
+    def frame(self, event: Dict) -> bytes:
+        """Encodes one event as a frame with the next event id."""
+        self.last_event_id += 1
+        metrics.incr("sse.frames")
+        return b"id: %s%d\n%s" % (self.id_prefix, self.last_event_id, self._data(event))
+
+    def _data(self, event: Dict) -> bytes:
+        if event.get("type") != "status":
+            return b"data: %s\n\n" % encode_json(event)
+        key = tuple(event.items())
+        data = self._frame_cache.get(key)
+        if data is None:
+            data = b"data: %s\n\n" % encode_json(event)
+            if len(self._frame_cache) < SSE_FRAME_CACHE_SIZE:
+                self._frame_cache[key] = data
+        return data
+
+    @property
+    def flush_deadline(self) -> Optional[float]:
+        """Monotonic time at which buffered tokens are due, None when nothing is buffered."""
+        if self._pending_since is None:
+            return None
+        return self._pending_since + self.flush_seconds
+
+    def push(self, event: Dict) -> List[bytes]:
+        """Buffers a token event or returns the frames to write now."""
+        if event.get("type") != "token":
+            return self.flush() + [self.frame(event)]
+
+        metrics.incr("sse.token_chunks")
+        content = event.get("content", "")
+        reasoning = event.get("reasoning_content", "")
+        self._content.append(content)
+        self._reasoning.append(reasoning)
+        self._pending_bytes += len(content) + len(reasoning)
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+
+        if (
+            self._pending_bytes >= self.flush_bytes
+            or time.monotonic() >= self.flush_deadline
+        ):
+            return self.flush()
+        return []
+
+    def flush(self) -> List[bytes]:
+        """Frames for the buffered tokens, merged into a single token event."""
+        if self._pending_since is None:
+            return []
+        event = {
+            "type": "token",
+            "content": "".join(self._content),
+            "reasoning_content": "".join(self._reasoning),
+        }
+        self._content, self._reasoning = [], []
+        self._pending_bytes = 0
+        self._pending_since = None
+        return [self.frame(event)]
+
+
+async def sse_stream(
+    events: AsyncIterator[Dict], writer: Optional[SSEWriter] = None
+) -> AsyncIterator[bytes]:
+    """
+    Writes an event stream as SSE frames. Events are produced in their own task so a
+    token buffer is flushed when its window ends, even while the producer is waiting
+    on the model. The producer is cancelled when this stream is closed.
+    """
+    writer = writer or SSEWriter()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce() -> None:
+        try:
+            async for event in events:
+                await queue.put(event)
+        finally:
+            await queue.put(_DONE)
+
+    producer = asyncio.create_task(produce())
+    _producers.add(producer)
+    producer.add_done_callback(_producers.discard)
+    try:
+        while True:
+            deadline = writer.flush_deadline
+            try:
+                if deadline is None:
+                    event = await queue.get()
+                else:
+                    timeout = max(deadline - time.monotonic(), 0)
+                    event = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                for frame in writer.flush():
+                    yield frame
+                continue
+
+            if event is _DONE:
+                break
+            for frame in writer.push(event):
+                yield frame
+
+        for frame in writer.flush():
+            yield frame
+        if not producer.cancelled():
+            await producer  # Surfaces an exception raised by the producer
+    finally:
+        if not producer.done():
+            producer.cancel()
@@ -0,0 +1,203 @@
+"""Shared, resumable agent generations buffered as SSE frames in a bounded ring"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from utils.metrics import metrics
+from utils.sse import SSEWriter, encode_json, sse_stream
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# Frames kept per generation for replay; older frames are dropped first
+STREAM_BUFFER_FRAMES = int(os.getenv("STREAM_BUFFER_FRAMES") or 4096)
+# Comment frame sent when nothing else was written for this long (e.g. during retrieval)
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS") or 10)
+# How long a generation keeps running with no client attached before it is cancelled
+STREAM_RESUME_GRACE_SECONDS = float(os.getenv("STREAM_RESUME_GRACE_SECONDS") or 15)
+# How long a finished generation stays available for replay
+STREAM_RETENTION_SECONDS = float(os.getenv("STREAM_RETENTION_SECONDS") or 120)
+# How often an attached client's connection is checked
+SSE_DISCONNECT_POLL_SECONDS = float(os.getenv("SSE_DISCONNECT_POLL_SECONDS") or 1)
+
+HEARTBEAT_FRAME = b": heartbeat\n\n"
+# Sent without an id when a resume asks for frames the ring has dropped; ends the stream
+RESUME_GAP_FRAME = b"data: %s\n\n" % encode_json(
+    {
+        "type": "resume_gap",
+        "content": "Part of the answer could not be resumed; reload the chat to see it in full.",
+    }
+)
+
+
+class Generation:
+    """
+    One agent run, streamed to any number of clients.
+
+    A pump task writes the run's events as SSE frames into a ring. Clients replay the
+    ring from the event after their `Last-Event-ID` and then follow the live frames.
+    When the last client leaves, the run is cancelled after a grace period unless a
+    client reconnects first.
+    """
+
+    def __init__(self, session_id: str, question: str, events: AsyncIterator[Dict]):
+        self.stream_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.question = question
+        self.frames: Deque[Tuple[int, bytes]] = deque(maxlen=STREAM_BUFFER_FRAMES)
+        self.last_event_id = 0
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self._grace: Optional[asyncio.TimerHandle] = None
+        self._task = asyncio.create_task(self._pump(events))
+
+    async def _pump(self, events: AsyncIterator[Dict]) -> None:
+        try:
+            async for frame in sse_stream(events, SSEWriter(stream_id=self.stream_id)):
+                # Frames are numbered in the order the writer produced them
+                self.last_event_id += 1
+                self.frames.append((self.last_event_id, frame))
+                self._notify()
+        except asyncio.CancelledError:
+            logger.info(
+                f"Generation {self.stream_id} cancelled with no client attached"
+            )
+        except Exception as e:
+            logger.error(f"Error in generation {self.stream_id}: {e}")
+        finally:
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._notify()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def _attach(self) -> None:
+        self.subscribers += 1
+        if self._grace:
+            self._grace.cancel()
+            self._grace = None
+
+    def _detach(self) -> None:
+        self.subscribers -= 1
+        if self.subscribers == 0 and not self.done:
+            self._grace = asyncio.get_running_loop().call_later(
+                STREAM_RESUME_GRACE_SECONDS, self._abandon
+            )
+
+    def _abandon(self) -> None:
+        self._grace = None
+        if self.subscribers == 0 and not self.done:
+            self._task.cancel()
+
+    def _frames_after(self, event_id: int) -> Optional[list]:
+        """Frames after `event_id`; None when the ring no longer holds all of them."""
+        if not self.frames:
+            return []
+        first = self.frames[0][0]
+        if event_id + 1 < first:
+            return None
+        return list(islice(self.frames, event_id + 1 - first, None))
+
+    async def subscribe(
+        self,
+        after: int = 0,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    ) -> AsyncIterator[bytes]:
+        """Frames after event `after`, then live frames until the run ends or the client leaves."""
+        self._attach()
+        try:
+            sent = after
+            last_write = time.monotonic()
+            while True:
+                changed = self._changed
+                frames = self._frames_after(sent)
+                if frames is None:
+                    metrics.incr("sse.resume_gaps")
+                    yield RESUME_GAP_FRAME
+                    return
+                for event_id, frame in frames:
+                    yield frame
+                    sent = event_id
+                    last_write = time.monotonic()
+                if self.done and sent >= self.last_event_id:
+                    return
+
+                try:
+                    await asyncio.wait_for(changed.wait(), SSE_DISCONNECT_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    if is_disconnected and await is_disconnected():
+                        return
+                    if time.monotonic() - last_write >= STREAM_HEARTBEAT_SECONDS:
+                        yield HEARTBEAT_FRAME
+                        last_write = time.monotonic()
+        finally:
+            self._detach()
+
+
+class GenerationRegistry:
+    """Running and recently finished generations, by stream id and by session."""
+
+    def __init__(self):
+        self._streams: Dict[str, Generation] = {}
+        self._sessions: Dict[str, Generation] = {}
+
+    def get(self, stream_id: str) -> Optional[Generation]:
+        self._sweep()
+        return self._streams.get(stream_id)
+
+    def start_or_join(
+        self,
+        session_id: str,
+        question: str,
+        events_factory: Callable[[], AsyncIterator[Dict]],
+    ) -> Generation:
+        """
+        Joins the session's running generation when it answers the same question (e.g.
+        a second tab or a page rerun), otherwise starts a new one.
+        """
+        self._sweep()
+        current = self._sessions.get(session_id)
+        if current and not current.done and current.question == question:
+            metrics.incr("sse.shared_generations")
+            return current
+
+        generation = Generation(session_id, question, events_factory())
+        self._streams[generation.stream_id] = generation
+        self._sessions[session_id] = generation
+        return generation
+
+    def _sweep(self) -> None:
+        cutoff = time.monotonic() - STREAM_RETENTION_SECONDS
+        expired = [
+            stream_id
+            for stream_id, generation in self._streams.items()
+            if generation.done and generation.finished_at < cutoff
+        ]
+        for stream_id in expired:
+            generation = self._streams.pop(stream_id)
+            if self._sessions.get(generation.session_id) is generation:
+                del self._sessions[generation.session_id]
+
+
+def parse_last_event_id(value: Optional[str]) -> Tuple[str, int]:
+    """Splits a "<stream_id>-<n>" event id; ("", 0) when absent or malformed."""
+    stream_id, _, event_id = (value or "").rpartition("-")
+    if not stream_id or not event_id.isdigit():
+        return "", 0
+    return stream_id, int(event_id)
+
+
+# Process-wide registry used by /agent/ask
+generations = GenerationRegistry()
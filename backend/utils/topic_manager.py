@@ -1,7 +1,7 @@
 import logging
 import numpy as np
-from setup.init_config import embedding_model
-from utils.memory import get_chat_history, get_graph_instance
+from utils.memory import get_graph_instance, get_session_message_vectors
+from utils.query_embedding import embed_query_cached
 
 logger = logging.getLogger(__name__)
 
@@ -66,44 +66,42 @@ class TopicManager:
         Filters messages based on semantic relevance to the current question.
         """
         try:
-            # Get all messages
-            history = get_chat_history(session_id)
-            all_messages = history.messages if hasattr(history, "messages") else []
+            # Stored messages with their persisted embeddings, oldest first
+            rows = get_session_message_vectors(session_id)
 
-            if len(all_messages) <= 2:  # Only system message + first user message
+            if len(rows) <= 2:  # Only system message + first user message
                 return []
 
-            # Embed the question
-            question_embedding = np.array(embedding_model().embed_query(question))
-
-            # Score all messages based on relevance to current question
-            scored_messages = []
-            for msg in all_messages[1:]:  # Skip first message
-                msg_content = getattr(msg, "content", "")
-                if not msg_content:
-                    continue
-
-                msg_embedding = np.array(embedding_model().embed_query(msg_content))
-                similarity = float(
-                    np.dot(question_embedding, msg_embedding)
-                    / (
-                        np.linalg.norm(question_embedding)
-                        * np.linalg.norm(msg_embedding)
-                        + 1e-10
-                    )
-                )
-
-                scored_messages.append(
-                    {
-                        "similarity": similarity,
-                        "role": getattr(msg, "type", "unknown"),
-                        "content": msg_content,
-                    }
-                )
-
-            # Sort by similarity and return top N
-            scored_messages.sort(key=lambda x: x["similarity"], reverse=True)
-            relevant = scored_messages[:max_messages]
+            # Skip the first message and any message without content
+            rows = [row for row in rows[1:] if row["content"] and row["embedding"]]
+            if not rows:
+                return []
+
+            # Embed the question (shared with retrieval within the same request)
+            question_embedding = np.asarray(
+                embed_query_cached(question), dtype=np.float32
+            )
+
+            # Cosine similarity of every message in one matrix-vector product
+            matrix = np.asarray([row["embedding"] for row in rows], dtype=np.float32)
+            similarities = (matrix @ question_embedding) / (
+                np.linalg.norm(matrix, axis=1) * np.linalg.norm(question_embedding)
+                + 1e-10
+            )
+
+            # Top N without sorting the whole history, then order those N
+            k = min(max_messages, len(rows))
+            top = np.argpartition(-similarities, k - 1)[:k]
+            top = top[np.argsort(-similarities[top])]
+
+            relevant = [
+                {
+                    "similarity": float(similarities[i]),
+                    "role": rows[i]["role"] or "unknown",
+                    "content": rows[i]["content"],
+                }
+                for i in top
+            ]
 
             logger.info(f"Retrieved {len(relevant)} relevant context messages")
             return relevant
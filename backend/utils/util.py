@@ -1,6 +1,7 @@
 from langchain_core.documents import Document
-from typing import List, Any
-import json, docker, re, os, socket
+from datetime import datetime, timezone
+from typing import List, Any, Dict
+import json, docker, re, os, socket, hashlib
 
 
 def escape_lucene_chars(text: str) -> str:
@@ -139,3 +140,64 @@ def format_docs_with_metadata(docs: list[Document]) -> str:
     print("=" * 100 + "\n")
 
     return final_context_str
+
+
+# --- Materialized Question Context ---
+MAX_CONTEXT_ANSWERS = 5  # Answers kept per pre-rendered question context
+
+
+def _format_epoch_date(epoch_seconds: Any) -> str:
+    if epoch_seconds is None:
+        return "unknown"
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).date().isoformat()
+
+
+def _format_owner(owner: Dict | None) -> str:
+    owner = owner or {}
+    name = owner.get("display_name") or "deleted user"
+    reputation = owner.get("reputation")
+    return f"{name} (reputation {reputation})" if reputation is not None else name
+
+
+def render_question_context(
+    item: Dict, max_answers: int = MAX_CONTEXT_ANSWERS
+) -> tuple[str, str]:
+    """Renders a compact, LLM-ready context document for an ingested question.
+
+    Answers are capped to `max_answers`, accepted answer first and then by score.
+    Returns the rendered text and its SHA-256 hash so the stored document is only
+    re-written when the question or its answers change.
+    """
+    lines = [
+        f"Title: {item.get('title', '')}",
+        f"Link: {item.get('link', '')}",
+        f"Score: {_format_scalar(item.get('score'))} | "
+        f"Favorites: {_format_scalar(item.get('favorite_count'))} | "
+        f"Asked: {_format_epoch_date(item.get('creation_date'))} "
+        f"by {_format_owner(item.get('owner'))}",
+        f"Tags: {', '.join(item.get('tags', []))}",
+        "",
+        "Question:",
+        item.get("body_markdown", ""),
+    ]
+
+    answers = sorted(
+        item.get("answers", []),
+        key=lambda a: (bool(a.get("is_accepted")), a.get("score") or 0),
+        reverse=True,
+    )
+    kept = answers[:max_answers]
+    for idx, answer in enumerate(kept, start=1):
+        accepted = "accepted, " if answer.get("is_accepted") else ""
+        lines += [
+            "",
+            f"Answer {idx} ({accepted}score {_format_scalar(answer.get('score'))}) "
+            f"by {_format_owner(answer.get('owner'))} "
+            f"on {_format_epoch_date(answer.get('creation_date'))}:",
+            answer.get("body_markdown", ""),
+        ]
+    if len(answers) > len(kept):
+        lines += ["", f"…(+{len(answers) - len(kept)} lower-scored answers omitted)"]
+
+    context = "\n".join(lines)
+    return context, hashlib.sha256(context.encode("utf-8")).hexdigest()
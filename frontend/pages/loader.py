@@ -1,4 +1,5 @@
-import os, time, requests
+import os, time, json, requests, httpx
+from httpx_sse import connect_sse
 from dotenv import load_dotenv
 import streamlit as st
 from streamlit.logger import get_logger
@@ -20,9 +21,11 @@ st.set_page_config(
 )
 
 so_api_base_url = "https://api.stackexchange.com/2.3/search/advanced"
+INGEST_SUBMIT_RETRIES = 5  # Attempts per page while the ingestion queue is full
+INGEST_WATCH_RECONNECTS = 5  # Reconnects of the job progress stream
 
 
-def load_so_data(tag: str, page: int, site: str) -> dict:
+def load_so_data(tag: str, page: int, site: str, job_id: str | None = None) -> dict:
     """
     Load Stack Overflow data and handle potential errors gracefully.
     This function is now designed to run in a background thread and should NOT call any st.* functions.
@@ -65,7 +68,15 @@ def load_so_data(tag: str, page: int, site: str) -> dict:
             elif "error_name" in data:
                 backoff_time = min(300, 2 ** (page % 8))  # Max 300 seconds
                 time.sleep(backoff_time)
-            insert_so_data(data)
+            if not insert_so_data(data, job_id):
+                return {
+                    "status": "error",
+                    "tag": tag,
+                    "page": page,
+                    "error": "The backend did not accept the page",
+                    # insert_so_data already counted it as failed on the job
+                    "reported": bool(job_id),
+                }
             return {
                 "status": "success",
                 "tag": tag,
@@ -106,20 +117,108 @@ def load_high_score_so_data(site: str) -> None:
         st.warning("No highly ranked items found. Skipping.")
 
 
-def insert_so_data(data: dict) -> None:
-    """Insert StackOverflow data into Neo4j via Backend API."""
+def create_ingest_job(expected_pages: int) -> str | None:
+    """Create a backend ingestion job that completes after `expected_pages` pages."""
     try:
         response = requests.post(
-            f"{BACKEND_URL}/api/v1/ingest", json={"data": data["items"]}
+            f"{BACKEND_URL}/api/v1/ingest/jobs",
+            json={"expected_pages": expected_pages},
+            timeout=10,
+        )
+        response.raise_for_status()
+        res_json = response.json()
+        if res_json["status"] == "success":
+            return res_json["job_id"]
+        logger.error(f"Could not create ingest job: {res_json.get('message')}")
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error creating ingest job: {e}")
+    return None
+
+
+def report_failed_page(job_id: str, error: str) -> None:
+    """Count a page that never reached the ingestion job as failed, so the job can finish."""
+    try:
+        requests.post(
+            f"{BACKEND_URL}/api/v1/ingest/jobs/{job_id}/failures",
+            json={"error": error},
+            timeout=10,
+        ).raise_for_status()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Could not report failed page for ingest job {job_id}: {e}")
+
+
+def insert_so_data(data: dict, job_id: str | None = None) -> bool:
+    """Insert StackOverflow data into Neo4j via Backend API.
+
+    With a job id the page is queued on the backend and this returns immediately,
+    retrying while the ingestion queue is full; a page that cannot be queued is
+    reported as failed. Without one the request blocks until the page is embedded
+    and written.
+    """
+    try:
+        url = (
+            f"{BACKEND_URL}/api/v1/ingest/jobs/{job_id}/pages"
+            if job_id
+            else f"{BACKEND_URL}/api/v1/ingest"
         )
+        for attempt in range(INGEST_SUBMIT_RETRIES):
+            response = requests.post(url, json={"data": data["items"]})
+            if response.status_code != 429 or attempt == INGEST_SUBMIT_RETRIES - 1:
+                break
+            time.sleep(2**attempt)  # Queue full: 1s, 2s, 4s...
         response.raise_for_status()
         res_json = response.json()
         if res_json["status"] != "success":
             logger.error(f"Ingest failed: {res_json.get('message')}")
             st.error(f"Ingestion failed for a page: {res_json.get('message')}")
+            if job_id:
+                report_failed_page(job_id, res_json.get("message", "Page rejected"))
+            return False
+        return True
     except Exception as e:
         logger.error(f"Error posting ingestion data: {e}")
         st.error(f"Failed to send data to backend: {e}")
+        if job_id:
+            report_failed_page(job_id, f"Failed to send page: {e}")
+        return False
+
+
+def watch_ingest_job(job_id: str, placeholder) -> dict:
+    """Follow the backend ingestion job over SSE until it finishes, reconnecting on stalls."""
+    progress = {}
+    # The backend repeats the job snapshot at least every 15s, so a silent stream is dead
+    timeout = httpx.Timeout(10, read=45)
+    for attempt in range(INGEST_WATCH_RECONNECTS + 1):
+        try:
+            with httpx.Client(timeout=timeout) as client:
+                with connect_sse(
+                    client, "GET", f"{BACKEND_URL}/api/v1/ingest/jobs/{job_id}/events"
+                ) as event_source:
+                    for sse in event_source.iter_sse():
+                        if not sse.data:
+                            continue
+                        progress = json.loads(sse.data)
+                        if progress.get("type") == "error":
+                            return progress
+                        done = progress["pages_done"] + progress["pages_failed"]
+                        with placeholder:
+                            st.progress(
+                                min(1.0, done / progress["expected_pages"]),
+                                text=(
+                                    f"Embedding & writing: {done}/{progress['expected_pages']} pages, "
+                                    f"{progress['items_per_second']} items/s, "
+                                    f"{progress['created']} created, {progress['updated']} updated, "
+                                    f"{progress['skipped']} skipped"
+                                ),
+                            )
+            if progress.get("status") in ("completed", "failed", "expired"):
+                return progress
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            if attempt == INGEST_WATCH_RECONNECTS:
+                raise
+            logger.warning(f"Ingest job stream interrupted ({e}), reconnecting")
+            time.sleep(2**attempt)
+    return progress
 
 
 # --- Streamlit ---
@@ -166,9 +265,12 @@ def render_page():
             completed_tasks = 0
             total_imported_count = 0
 
+            # Pages are queued on a backend job, so fetching never waits on embedding
+            job_id = create_ingest_job(tasks_to_complete)
+
             with ThreadPoolExecutor(max_workers=4) as executor:
                 futures = [
-                    executor.submit(load_so_data, tag, start_page + i, site)
+                    executor.submit(load_so_data, tag, start_page + i, site, job_id)
                     for tag in tags_to_import
                     for i in range(num_pages)
                 ]
@@ -180,6 +282,16 @@ def render_page():
 
                     progress = (completed_tasks / tasks_to_complete) * 100
 
+                    # Pages without items still count towards the job's expected pages
+                    if job_id and result["status"] == "empty":
+                        insert_so_data({"items": []}, job_id)
+                    elif (
+                        job_id
+                        and result["status"] == "error"
+                        and not result.get("reported")
+                    ):
+                        report_failed_page(job_id, result["error"])
+
                     with info_placeholder:
                         if result["status"] == "success":
                             total_imported_count += result["count"]
@@ -197,10 +309,22 @@ def render_page():
                                 f"({progress:.2f}%) ❌ Failed: Page {result['page']} for tag '{result['tag']}'. Reason: {result['error']}"
                             )
 
+            job_progress = {}
+            if job_id:
+                try:
+                    job_progress = watch_ingest_job(job_id, info_placeholder)
+                except httpx.HTTPError as e:
+                    st.warning(f"Lost track of ingestion job {job_id}: {e}")
+            # The job counts what was actually written; the fetched count is a fallback
+            if "created" in job_progress:
+                total_imported_count = job_progress["created"] + job_progress["updated"]
+
             st.success(
                 f"Import complete! Successfully imported {total_imported_count} questions.",
                 icon="✅",
             )
+            for error in job_progress.get("errors", []):
+                st.error(f"❌ Ingestion error: {error}")
 
             # Record the import session in Neo4j
             try:
@@ -209,6 +333,7 @@ def render_page():
                     "total_questions": total_imported_count,
                     "tags_list": tags_to_import,
                     "total_pages": num_pages,
+                    "job_id": job_id,
                 }
                 rec_resp = requests.post(
                     f"{BACKEND_URL}/api/v1/ingest/record", json=payload
@@ -21,6 +21,9 @@ CHATS_URL = f"{BACKEND_URL}/api/v1/user"  # /{user_id}/chats
 CHAT_HISTORY_URL = f"{BACKEND_URL}/api/v1/chat"
 USERS_URL = f"{BACKEND_URL}/api/v1/users"
 AGENT_URL = f"{BACKEND_URL}/agent/ask"
+STREAM_RECONNECT_ATTEMPTS = 3  # Resumes of an interrupted answer stream
+USER_CHATS_PAGE_SIZE = 100  # Sessions per /chats request
+USER_CHATS_MAX_PAGES = 20  # Pages of older sessions loaded into the sidebar
 
 
 # --- API Helper Functions with Error Handling ---
@@ -98,27 +101,46 @@ def update_import_log_api(import_id, data):
         return False
 
 
-def fetch_user_chats(user_id, retry_count=2):
-    """Fetch user's chat sessions with retry logic."""
+def _fetch_user_chats_page(user_id, before, retry_count):
+    """Fetch one page of chat sessions; None when the request fails."""
+    params = {"limit": USER_CHATS_PAGE_SIZE}
+    if before:
+        params["before"] = before
     for attempt in range(retry_count):
         try:
-            response = requests.get(f"{CHATS_URL}/{user_id}/chats", timeout=5)
+            response = requests.get(
+                f"{CHATS_URL}/{user_id}/chats", params=params, timeout=5
+            )
             response.raise_for_status()
             data = response.json()
             if data.get("status") == "success":
-                return data.get("chats", [])
-            return []
+                return data
+            return None
         except requests.exceptions.Timeout:
             if attempt < retry_count - 1:
                 continue
             logger.error(f"Timeout fetching chats for user {user_id}")
-            return []
+            return None
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching chats for user {user_id}: {e}")
             if attempt < retry_count - 1:
                 continue
-            return []
-    return []
+            return None
+    return None
+
+
+def fetch_user_chats(user_id, retry_count=2):
+    """Fetch user's chat sessions, newest first, following the `next_cursor` pages."""
+    chats, cursor = [], None
+    for _ in range(USER_CHATS_MAX_PAGES):
+        data = _fetch_user_chats_page(user_id, cursor, retry_count)
+        if data is None:
+            break
+        chats.extend(data.get("chats", []))
+        cursor = data.get("next_cursor")
+        if not cursor:
+            break
+    return chats
 
 
 def fetch_chat_history(session_id, retry_count=2):
@@ -22,6 +22,7 @@ from utils.util import (
     delete_chat_api,
     BACKEND_URL,
     AGENT_URL,
+    STREAM_RECONNECT_ATTEMPTS,
 )
 
 # Setup logging
@@ -381,84 +382,146 @@ else:
                                 "user_id": user_id,
                             }
                             timeout = httpx.Timeout(60, read=60)
-                            with httpx.Client(timeout=timeout) as client:
-                                with connect_sse(
-                                    client,
-                                    "POST",
-                                    AGENT_URL,
-                                    json=payload,
-                                ) as event_source:
-                                    for sse in event_source.iter_sse():
-                                        if sse.data:
-                                            try:
-                                                data = json.loads(sse.data)
-                                                msg_type = data.get("type")
-
-                                                # --- Handle Status Events ---
-                                                if msg_type == "status":
-                                                    stage = data.get("stage")
-                                                    message = data.get("message", "")
-                                                    status_state = data.get("status")
-
-                                                    # Update the container label to show current activity
-                                                    status_box.update(
-                                                        label=message, state="running"
-                                                    )
-
-                                                    if status_state == "running":
-                                                        st.info(message, icon="🔄")
-                                                    elif status_state == "complete":
-                                                        st.success(message, icon="✅")
-
-                                                # --- Handle Token Events ---
-                                                elif msg_type == "token":
-                                                    # Collapse status box once generation starts
-                                                    status_box.update(
-                                                        label="✅ Analysis Complete. Generating Response...",
-                                                        state="complete",
-                                                        expanded=False,
-                                                    )
-
-                                                    chunk_content = data.get(
-                                                        "content", ""
-                                                    )
-                                                    chunk_thought = data.get(
-                                                        "reasoning_content", ""
-                                                    )
-
-                                                    answer_content += chunk_content
-                                                    thought_content += chunk_thought
-
-                                                    # Render Answer
-                                                    if answer_content:
-                                                        answer_placeholder.markdown(
-                                                            answer_content + "▌"
-                                                        )
-
-                                                    # Render Thoughts
-                                                    if thought_content:
-                                                        thought_placeholder.markdown(
-                                                            thought_content + "▌"
-                                                        )
-
-                                                # --- Handle Errors ---
-                                                elif msg_type == "error":
-                                                    status_box.update(
-                                                        label="❌ Error Occurred",
-                                                        state="error",
-                                                        expanded=True,
-                                                    )
-                                                    st.error(
-                                                        data.get(
-                                                            "content", "Unknown error"
-                                                        )
-                                                    )
-
-                                            except json.JSONDecodeError as e:
-                                                logger.error(
-                                                    f"Error decoding JSON: {sse.data}, \n{e}"
+                            # On a dropped connection, resume the same generation after the last event
+                            last_event_id = None
+                            for attempt in range(STREAM_RECONNECT_ATTEMPTS + 1):
+                                headers = (
+                                    {"Last-Event-ID": last_event_id}
+                                    if last_event_id
+                                    else {}
+                                )
+                                try:
+                                    with httpx.Client(timeout=timeout) as client:
+                                        with connect_sse(
+                                            client,
+                                            "POST",
+                                            AGENT_URL,
+                                            json=payload,
+                                            headers=headers,
+                                        ) as event_source:
+                                            if event_source.response.status_code in (
+                                                404,
+                                                410,
+                                            ):
+                                                # The interrupted answer expired; keep what was received
+                                                st.warning(
+                                                    "The rest of this answer is no longer available."
                                                 )
-                                                continue
+                                                break
+                                            for sse in event_source.iter_sse():
+                                                if sse.id:
+                                                    last_event_id = sse.id
+                                                if sse.data:
+                                                    try:
+                                                        data = json.loads(sse.data)
+                                                        msg_type = data.get("type")
+
+                                                        # --- Handle Status Events ---
+                                                        if msg_type == "status":
+                                                            stage = data.get("stage")
+                                                            message = data.get(
+                                                                "message", ""
+                                                            )
+                                                            status_state = data.get(
+                                                                "status"
+                                                            )
+
+                                                            # Update the container label to show current activity
+                                                            status_box.update(
+                                                                label=message,
+                                                                state="running",
+                                                            )
+
+                                                            if (
+                                                                status_state
+                                                                == "running"
+                                                            ):
+                                                                st.info(
+                                                                    message, icon="🔄"
+                                                                )
+                                                            elif (
+                                                                status_state
+                                                                == "complete"
+                                                            ):
+                                                                st.success(
+                                                                    message, icon="✅"
+                                                                )
+
+                                                        # --- Handle Token Events ---
+                                                        elif msg_type == "token":
+                                                            # Collapse status box once generation starts
+                                                            status_box.update(
+                                                                label="✅ Analysis Complete. Generating Response...",
+                                                                state="complete",
+                                                                expanded=False,
+                                                            )
+
+                                                            chunk_content = data.get(
+                                                                "content", ""
+                                                            )
+                                                            chunk_thought = data.get(
+                                                                "reasoning_content", ""
+                                                            )
+
+                                                            answer_content += (
+                                                                chunk_content
+                                                            )
+                                                            thought_content += (
+                                                                chunk_thought
+                                                            )
+
+                                                            # Render Answer
+                                                            if answer_content:
+                                                                answer_placeholder.markdown(
+                                                                    answer_content + "▌"
+                                                                )
+
+                                                            # Render Thoughts
+                                                            if thought_content:
+                                                                thought_placeholder.markdown(
+                                                                    thought_content
+                                                                    + "▌"
+                                                                )
+
+                                                        # --- Handle a Resume Gap (the stream ends here) ---
+                                                        elif msg_type == "resume_gap":
+                                                            st.warning(
+                                                                data.get("content", "")
+                                                            )
+
+                                                        # --- Handle Errors ---
+                                                        elif msg_type == "error":
+                                                            status_box.update(
+                                                                label="❌ Error Occurred",
+                                                                state="error",
+                                                                expanded=True,
+                                                            )
+                                                            st.error(
+                                                                data.get(
+                                                                    "content",
+                                                                    "Unknown error",
+                                                                )
+                                                            )
+
+                                                    except json.JSONDecodeError as e:
+                                                        logger.error(
+                                                            f"Error decoding JSON: {sse.data}, \n{e}"
+                                                        )
+                                                        continue
+                                    break
+                                except (
+                                    httpx.ReadTimeout,
+                                    httpx.RemoteProtocolError,
+                                    httpx.ReadError,
+                                ) as e:
+                                    if (
+                                        not last_event_id
+                                        or attempt == STREAM_RECONNECT_ATTEMPTS
+                                    ):
+                                        raise
+                                    logger.warning(
+                                        f"Stream interrupted ({e}), resuming after {last_event_id}"
+                                    )
 
                             # --- Final Processing and Rendering ---
                             # Remove type cursors and render final markdown/mermaid